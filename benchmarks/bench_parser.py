@@ -0,0 +1,168 @@
+"""Throughput benchmarks for multifruits.Parser.
+
+    python benchmarks/bench_parser.py --save baseline.json
+    python benchmarks/bench_parser.py --compare baseline.json
+
+With --compare, exits with an error when a case is slower than the baseline
+by more than --threshold.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+from multifruits import MultipartWriter, Parser
+
+CHUNK_SIZES = (1, 64, 4096, 65536, 1024 * 1024)
+# Corpora are smaller for tiny chunks, to keep runs short.
+SMALL_CHUNK_SIZE = 64
+SMALL_CORPUS_SIZE = 256 * 1024
+CORPUS_SIZE = 16 * 1024 * 1024
+
+
+def multipart(boundary, parts):
+    writer = MultipartWriter(boundary)
+    for headers, content in parts:
+        writer.add_part(content, headers)
+    return b''.join(writer)
+
+
+def large_file(size, boundary=b'----WebKitFormBoundary7MA4YWxkTrZu0gW'):
+    content = random.Random(1).getrandbits(size * 8).to_bytes(size, 'little')
+    return boundary, multipart(boundary, [(
+        [(b'Content-Disposition',
+          b'form-data; name="file"; filename="video.mp4"'),
+         (b'Content-Type', b'video/mp4')],
+        content)])
+
+
+def tiny_fields(size, boundary=b'----WebKitFormBoundary7MA4YWxkTrZu0gW'):
+    parts = []
+    index = 0
+    while size > 0:
+        name = b'field%d' % index
+        parts.append(([(b'Content-Disposition',
+                        b'form-data; name="' + name + b'"')], b'value'))
+        size -= 100
+        index += 1
+    return boundary, multipart(boundary, parts)
+
+
+def crlf_dense(size, boundary=b'----WebKitFormBoundary7MA4YWxkTrZu0gW'):
+    # Looks like the beginning of a boundary over and over.
+    pattern = b'a,b\r\n\r\n-\r\n--\r\n----WebKit\r\r\n--' + boundary[:-1] + b'\n'
+    content = pattern * (size // len(pattern))
+    return boundary, multipart(boundary, [(
+        [(b'Content-Disposition',
+          b'form-data; name="file"; filename="data.csv"'),
+         (b'Content-Type', b'text/csv')],
+        content)])
+
+
+def long_boundary(size):
+    return large_file(size, boundary=b'-' * 30 + b'x' * 40)
+
+
+CORPORA = {
+    'large_file': large_file,
+    'tiny_fields': tiny_fields,
+    'crlf_dense': crlf_dense,
+    'long_boundary': long_boundary,
+}
+
+
+class Handler:
+
+    def __init__(self):
+        self.events = 0
+
+    def on_body_begin(self):
+        self.events += 1
+
+    def on_part_begin(self):
+        self.events += 1
+
+    def on_header(self, name, value):
+        self.events += 1
+
+    def on_headers_complete(self):
+        self.events += 1
+
+    def on_data(self, data):
+        self.events += 1
+
+    def on_part_complete(self):
+        self.events += 1
+
+    def on_body_complete(self):
+        self.events += 1
+
+
+def run(boundary, body, chunk_size, repeat):
+    content_type = b'multipart/form-data; boundary=' + boundary
+    chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+    best = None
+    for _ in range(repeat):
+        handler = Handler()
+        parser = Parser(handler, content_type)
+        start = time.perf_counter()
+        for chunk in chunks:
+            parser.feed_data(chunk)
+        duration = time.perf_counter() - start
+        if best is None or duration < best:
+            best = duration
+    return {
+        'mb_per_s': len(body) / best / 1e6,
+        'events_per_s': handler.events / best,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--corpus', action='append', choices=CORPORA)
+    parser.add_argument('--chunk-size', type=int, action='append')
+    parser.add_argument('--save', metavar='PATH')
+    parser.add_argument('--compare', metavar='PATH')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='Allowed slowdown ratio (default: 0.1).')
+    args = parser.parse_args(argv)
+
+    results = {}
+    print(f'{"case":<28}{"MB/s":>12}{"events/s":>16}')
+    for name in args.corpus or CORPORA:
+        corpora = {}
+        for chunk_size in args.chunk_size or CHUNK_SIZES:
+            size = (SMALL_CORPUS_SIZE if chunk_size < SMALL_CHUNK_SIZE
+                    else CORPUS_SIZE)
+            if size not in corpora:
+                corpora[size] = CORPORA[name](size)
+            boundary, body = corpora[size]
+            case = f'{name}/{chunk_size}'
+            results[case] = run(boundary, body, chunk_size, args.repeat)
+            print(f'{case:<28}{results[case]["mb_per_s"]:>12.1f}'
+                  f'{results[case]["events_per_s"]:>16.0f}')
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = []
+        for case, result in results.items():
+            if case not in baseline:
+                continue
+            ratio = result['mb_per_s'] / baseline[case]['mb_per_s']
+            if ratio < 1 - args.threshold:
+                regressions.append(f'{case}: {ratio:.0%} of baseline')
+        if regressions:
+            print('\nRegressions:', *regressions, sep='\n  ')
+            return 1
+        print('\nNo regression.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
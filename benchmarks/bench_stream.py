@@ -0,0 +1,77 @@
+"""parse_stream against a naive read loop, on blocking file objects.
+
+    python benchmarks/bench_stream.py --buffer-size 4096 --buffer-size 65536
+
+The naive loop allocates a new bytes object for every chunk read, while
+parse_stream reads into a single reused buffer.
+"""
+import argparse
+import io
+import sys
+import tempfile
+import time
+
+from bench_parser import large_file
+from multifruits import Parser, parse_stream
+
+
+class Handler:
+
+    def on_data(self, data):
+        pass
+
+
+def naive(fileobj, content_type, buffer_size):
+    parser = Parser(Handler(), content_type, zero_copy=True)
+    while True:
+        chunk = fileobj.read(buffer_size)
+        if not chunk:
+            break
+        parser.feed_data(chunk)
+
+
+def stream(fileobj, content_type, buffer_size):
+    parse_stream(fileobj, Handler(), content_type, buffer_size=buffer_size,
+                 zero_copy=True)
+
+
+def run(func, open_body, content_type, size, buffer_size, repeat):
+    best = None
+    for _ in range(repeat):
+        with open_body() as fileobj:
+            start = time.perf_counter()
+            func(fileobj, content_type, buffer_size)
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return size / best / 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--buffer-size', type=int, action='append')
+    parser.add_argument('--size', type=int, default=64 * 1024 * 1024)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    boundary, body = large_file(args.size)
+    content_type = b'multipart/form-data; boundary=' + boundary
+    with tempfile.NamedTemporaryFile() as spooled:
+        spooled.write(body)
+        spooled.flush()
+        sources = {
+            'memory': lambda: io.BytesIO(body),
+            'file': lambda: open(spooled.name, 'rb', buffering=0),
+        }
+        print(f'{"case":<24}{"naive MB/s":>12}{"stream MB/s":>13}')
+        for buffer_size in args.buffer_size or (4096, 65536, 1024 * 1024):
+            for name, open_body in sources.items():
+                results = [run(func, open_body, content_type, len(body),
+                               buffer_size, args.repeat)
+                           for func in (naive, stream)]
+                print(f'{name + "/" + str(buffer_size):<24}'
+                      f'{results[0]:>12.1f}{results[1]:>13.1f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""Parser throughput scaling across threads.
+
+    python benchmarks/bench_threads.py --threads 1 --threads 2 --threads 4
+
+Each thread parses its own copy of a large upload; the part bodies are
+scanned without the GIL, so the aggregated throughput should grow with the
+number of threads.
+"""
+import argparse
+import sys
+import threading
+import time
+
+from bench_parser import large_file
+from multifruits import Parser
+
+
+class Handler:
+
+    def on_data(self, data):
+        pass
+
+
+def parse(boundary, body, chunk_size):
+    parser = Parser(Handler(), b'multipart/form-data; boundary=' + boundary,
+                    zero_copy=True)
+    view = memoryview(body)
+    for i in range(0, len(body), chunk_size):
+        parser.feed_data(view[i:i + chunk_size])
+
+
+def run(boundary, body, threads, chunk_size):
+    workers = [threading.Thread(target=parse,
+                                args=(boundary, body, chunk_size))
+               for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return len(body) * threads / (time.perf_counter() - start) / 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, action='append')
+    parser.add_argument('--size', type=int, default=64 * 1024 * 1024)
+    parser.add_argument('--chunk-size', type=int, default=1024 * 1024)
+    args = parser.parse_args(argv)
+
+    boundary, body = large_file(args.size)
+    print(f'{"threads":<10}{"MB/s":>12}')
+    for threads in args.threads or (1, 2, 4):
+        print(f'{threads:<10}{run(boundary, body, threads, args.chunk_size):>12.1f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,31 @@
 # cython: language_level=3
 
 from cpython cimport bool
+from cpython.buffer cimport (PyBUF_READ, PyBUF_SIMPLE, PyBuffer_Release,
+                             PyObject_GetBuffer)
+from cpython.bytes cimport PyBytes_FromStringAndSize
+from cpython.exc cimport PyErr_CheckSignals
+from cpython.memoryview cimport PyMemoryView_FromMemory
+from libc.errno cimport EINTR, errno
+from libc.stdlib cimport free, malloc, realloc
+from libc.string cimport memchr, memcmp, memcpy, memset, strerror
+from posix.time cimport CLOCK_MONOTONIC, clock_gettime, timespec
+from posix.unistd cimport write
+
+import hashlib
+import mmap
+import os
+import zlib
+from collections import OrderedDict, deque
+from errno import EINVAL, ENOSYS, EOPNOTSUPP, EXDEV
+from threading import local
+from types import MappingProxyType
+from urllib.parse import quote_from_bytes, unquote_to_bytes
+from tempfile import SpooledTemporaryFile
+
+# copy_file_range and sendfile may refuse some pairs of file descriptors
+# (other filesystem, pipe, old kernel): fall back to the next method then.
+_COPY_FALLBACK = (EINVAL, ENOSYS, EOPNOTSUPP, EXDEV)
 
 
 cdef enum state:
@@ -24,72 +49,1094 @@ cdef enum state:
     DATA_BOUNDARY_DONE_HY_HY,
     EPILOGUE,
 
+
+cdef tuple STATE_NAMES = (
+    'PREAMBLE', 'PREAMBLE_HY', 'FIRST_BOUNDARY', 'FIRST_BOUNDARY_DONE',
+    'HEADER_NAME_START', 'HEADER_NAME', 'HEADER_VALUE_START', 'HEADER_VALUE',
+    'HEADER_VALUE_CR', 'HEADERS_DONE', 'DATA', 'DATA_CR', 'DATA_CR_LF',
+    'DATA_CR_LF_HY', 'DATA_BOUNDARY', 'DATA_BOUNDARY_DONE',
+    'DATA_BOUNDARY_DONE_CR_LF', 'DATA_BOUNDARY_DONE_HY_HY', 'EPILOGUE')
+
+
+cpdef enum Event:
+    BODY_BEGIN,  # With the nesting depth, 0 for the outer body.
+    PART_BEGIN,
+    HEADER,
+    HEADERS_COMPLETE,
+    PART_DATA,  # Offsets in the fed buffer.
+    PART_DATA_BYTES,  # Data carried over from previous chunks.
+    PART_COMPLETE,  # With a PartSummary when digests are computed.
+    BODY_COMPLETE,  # With the nesting depth.
+
+# Call counters of the callbacks without an Event, after the Event ones.
+cdef enum:
+    ON_HEADERS_CALLS = 8
+    ON_PART_INFO_CALLS = 9
+    CALL_COUNTERS = 10
+
+# Callback names, indexed by Event, then by the counters above.
+cdef tuple CALLBACK_NAMES = (
+    'on_body_begin', 'on_part_begin', 'on_header', 'on_headers_complete',
+    'on_data', 'on_data', 'on_part_complete', 'on_body_complete',
+    'on_headers', 'on_part_info')
+
+
+cdef long long _now() noexcept nogil:
+    cdef timespec ts
+    clock_gettime(CLOCK_MONOTONIC, &ts)
+    return ts.tv_sec * 1000000000LL + ts.tv_nsec
+
+
+cdef void _build_skip_table(const unsigned char *needle, Py_ssize_t length,
+                            Py_ssize_t *table) noexcept nogil:
+    # Boyer-Moore-Horspool bad character shifts.
+    cdef Py_ssize_t k
+    for k in range(256):
+        table[k] = length
+    for k in range(length - 1):
+        table[needle[k]] = length - 1 - k
+
+
+cdef Py_ssize_t _find(const unsigned char *data, Py_ssize_t start,
+                      Py_ssize_t end, const unsigned char *needle,
+                      Py_ssize_t length, const Py_ssize_t *table,
+                      Py_ssize_t *misses) noexcept nogil:
+    # Index of the first needle in data[start:end], -1 if not found. misses,
+    # unless NULL, is incremented for each candidate compared in vain.
+    cdef:
+        unsigned char last = needle[length - 1]
+        unsigned char c
+    while start + length <= end:
+        c = data[start + length - 1]
+        if c == last:
+            if memcmp(data + start, needle, length - 1) == 0:
+                return start
+            if misses != NULL:
+                misses[0] += 1
+        start += table[c]
+    return -1
+
+
+cdef Py_ssize_t _find_partial(const unsigned char *data, Py_ssize_t start,
+                              Py_ssize_t end, const unsigned char *needle,
+                              Py_ssize_t length) noexcept nogil:
+    # Index of the longest suffix of data[start:end] being a prefix of needle,
+    # end if there is none.
+    cdef Py_ssize_t i = end - length + 1
+    if i < start:
+        i = start
+    while i < end:
+        if data[i] == needle[0] and memcmp(data + i, needle, end - i) == 0:
+            return i
+        i += 1
+    return end
+
+
+cdef Py_ssize_t _find_delimiter(const unsigned char *data, Py_ssize_t start,
+                                Py_ssize_t end, const unsigned char *needle,
+                                Py_ssize_t length, const Py_ssize_t *table,
+                                Py_ssize_t *partial,
+                                Py_ssize_t *misses) noexcept nogil:
+    # Index of needle, or -1 with partial set to the index of a trailing
+    # prefix of needle (end if there is none).
+    cdef Py_ssize_t found = _find(data, start, end, needle, length, table,
+                                  misses)
+    if found < 0:
+        partial[0] = _find_partial(data, start, end, needle, length)
+    return found
+
+
+cdef Py_ssize_t _find_short(const unsigned char *data, Py_ssize_t start,
+                            Py_ssize_t end, const unsigned char *needle,
+                            Py_ssize_t length) noexcept nogil:
+    # Index of a short needle in data[start:end], -1 if not found.
+    cdef const unsigned char *found
+    while start + length <= end:
+        found = <const unsigned char *>memchr(data + start, needle[0],
+                                              end - start - length + 1)
+        if found == NULL:
+            return -1
+        start = found - data
+        if memcmp(found, needle, length) == 0:
+            return start
+        start += 1
+    return -1
+
+
+cdef Py_ssize_t _find_byte(const unsigned char *data, Py_ssize_t start,
+                           Py_ssize_t end, unsigned char c) noexcept nogil:
+    cdef const unsigned char *found = <const unsigned char *>memchr(
+        data + start, c, end - start)
+    if found == NULL:
+        return end
+    return found - data
+
+
+# Character classes, as bit flags.
+cdef enum:
+    TOKEN = 1  # RFC 7230 tchar.
+    SEMICOLON = 2
+    QUOTE = 4
+    EQUAL = 8
+    SPACE = 16
+    BACKSLASH = 32
+
+cdef unsigned char CHAR_CLASS[256]
+
+cdef void _init_char_classes():
+    cdef int c
+    for c in range(256):
+        CHAR_CLASS[c] = 0
+    for c in (b"!#$%&'*+-.^_`|~0123456789abcdefghijklmnopqrstuvwxyz"
+              b"ABCDEFGHIJKLMNOPQRSTUVWXYZ"):
+        CHAR_CLASS[c] = TOKEN
+    CHAR_CLASS[ord(';')] = SEMICOLON
+    CHAR_CLASS[ord('"')] = QUOTE
+    CHAR_CLASS[ord('=')] = EQUAL
+    CHAR_CLASS[ord(' ')] = SPACE
+    CHAR_CLASS[ord('\t')] = SPACE
+    CHAR_CLASS[ord('\\')] = BACKSLASH
+
+_init_char_classes()
+
+
+# Content-Transfer-Encoding decoders, fed chunk by chunk.
+cdef enum:
+    IDENTITY = 0
+    BASE64 = 1
+    QUOTED_PRINTABLE = 2
+
+cdef signed char BASE64_VALUE[256]
+cdef signed char HEX_VALUE[256]
+# Bytes that end a run of literal bytes in urlencoded bodies.
+cdef bint URLENCODED_SPECIAL[256]
+
+cdef void _init_decode_tables():
+    cdef int c, byte
+    for c in range(256):
+        BASE64_VALUE[c] = HEX_VALUE[c] = -1
+        URLENCODED_SPECIAL[c] = c in b'&=%+'
+    for c, byte in enumerate(b'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+                             b'abcdefghijklmnopqrstuvwxyz0123456789+/'):
+        BASE64_VALUE[byte] = c
+    for c, byte in enumerate(b'0123456789abcdef'):
+        HEX_VALUE[byte] = HEX_VALUE[byte - 32 if byte > b'9' else byte] = c
+
+_init_decode_tables()
+
+
+cdef Py_ssize_t _decode_base64(const unsigned char *data, Py_ssize_t length,
+                               unsigned char *out, unsigned int *bits,
+                               int *count) noexcept nogil:
+    # Characters outside of the alphabet, such as line breaks, are skipped,
+    # as binascii does. Incomplete quanta are kept in bits and count.
+    cdef:
+        Py_ssize_t i, n = 0
+        signed char value
+    for i in range(length):
+        value = BASE64_VALUE[data[i]]
+        if value < 0:
+            if data[i] == b'=':
+                n += _flush_base64(out + n, bits, count)
+            continue
+        bits[0] = (bits[0] << 6) | value
+        count[0] += 1
+        if count[0] == 4:
+            out[n] = (bits[0] >> 16) & 0xff
+            out[n + 1] = (bits[0] >> 8) & 0xff
+            out[n + 2] = bits[0] & 0xff
+            n += 3
+            bits[0] = count[0] = 0
+    return n
+
+
+cdef Py_ssize_t _flush_base64(unsigned char *out, unsigned int *bits,
+                              int *count) noexcept nogil:
+    cdef Py_ssize_t n = 0
+    if count[0] == 2:
+        out[0] = (bits[0] >> 4) & 0xff
+        n = 1
+    elif count[0] == 3:
+        out[0] = (bits[0] >> 10) & 0xff
+        out[1] = (bits[0] >> 2) & 0xff
+        n = 2
+    bits[0] = count[0] = 0
+    return n
+
+
+cdef Py_ssize_t _decode_quoted_printable(
+        const unsigned char *data, Py_ssize_t length, unsigned char *out,
+        unsigned int *digit, int *state) noexcept nogil:
+    # state is 0 in text, 1 after "=", 2 after "=" and a hex digit (kept in
+    # digit), 3 after "=\r". Invalid escapes are kept as is, so the output
+    # may be 2 bytes longer than the input.
+    cdef:
+        Py_ssize_t i = 0, n = 0
+        unsigned char c
+    while i < length:
+        c = data[i]
+        if state[0] == 0:
+            if c == b'=':
+                state[0] = 1
+            else:
+                out[n] = c
+                n += 1
+        elif state[0] == 1:
+            if HEX_VALUE[c] >= 0:
+                digit[0] = c
+                state[0] = 2
+            elif c == b'\r':
+                state[0] = 3
+            elif c == b'\n':  # Soft line break.
+                state[0] = 0
+            else:
+                out[n] = b'='
+                n += 1
+                state[0] = 0
+                continue
+        elif state[0] == 2:
+            state[0] = 0
+            if HEX_VALUE[c] >= 0:
+                out[n] = (HEX_VALUE[digit[0]] << 4) | HEX_VALUE[c]
+                n += 1
+            else:
+                out[n] = b'='
+                out[n + 1] = digit[0]
+                n += 2
+                continue
+        else:
+            # Soft line break, even without its LF.
+            state[0] = 0
+            if c != b'\n':
+                continue
+        i += 1
+    return n
+
+
+cdef Py_ssize_t _flush_quoted_printable(unsigned char *out,
+                                        unsigned int *digit,
+                                        int *state) noexcept nogil:
+    cdef Py_ssize_t n = 0
+    if state[0] == 1 or state[0] == 2:
+        out[0] = b'='
+        n = 1
+    if state[0] == 2:
+        out[1] = digit[0]
+        n = 2
+    state[0] = 0
+    return n
+
+
+# Well-known header names, returned as shared objects with canonical_headers.
+cdef tuple KNOWN_HEADERS = (b'Content-Disposition', b'Content-Type',
+                            b'Content-Transfer-Encoding', b'Content-Length',
+                            b'Content-ID')
+cdef tuple KNOWN_HEADERS_LOWER = tuple(name.lower() for name in KNOWN_HEADERS)
+
+
+cdef Py_ssize_t _skip_token(const unsigned char *data, Py_ssize_t start,
+                            Py_ssize_t end) noexcept nogil:
+    while start < end and CHAR_CLASS[data[start]] & TOKEN:
+        start += 1
+    return start
+
+
+cdef Py_ssize_t _known_header(const unsigned char *name,
+                              Py_ssize_t length) noexcept:
+    # Index of name in KNOWN_HEADERS, compared case-insensitively, or -1.
+    cdef:
+        Py_ssize_t index, k
+        const unsigned char *known
+        unsigned char c
+    for index in range(len(KNOWN_HEADERS_LOWER)):
+        known = <const unsigned char *><const char *>KNOWN_HEADERS_LOWER[index]
+        if len(<bytes>KNOWN_HEADERS_LOWER[index]) != length:
+            continue
+        for k in range(length):
+            c = name[k]
+            if b'A' <= c <= b'Z':
+                c += 32
+            if c != known[k]:
+                break
+        else:
+            return index
+    return -1
+
+
+# Scans shorter than this keep the GIL, as releasing it costs more than it
+# allows other threads to run.
+cdef Py_ssize_t NOGIL_THRESHOLD = 64 * 1024
+
+
+class LimitExceeded(ValueError):
+    pass
+
+
+class BodyTooLarge(LimitExceeded):
+    pass
+
+
+class TooManyParts(LimitExceeded):
+    pass
+
+
+class PartTooLarge(LimitExceeded):
+    pass
+
+
+class TooManyHeaders(LimitExceeded):
+    pass
+
+
+class HeaderTooLarge(LimitExceeded):
+    pass
+
+
+class TooManyFields(LimitExceeded):
+    pass
+
+
+class FieldTooLarge(LimitExceeded):
+    pass
+
+
+class NestingTooDeep(LimitExceeded):
+    pass
+
+
+cdef class DispositionCache:
+    # Bounded LRU cache of parse_content_disposition and extract_filename
+    # results, keyed by the raw header value. Params are returned as
+    # read-only mappings, as they are shared between callers.
+
+    cdef:
+        object _entries
+        readonly Py_ssize_t maxsize
+        readonly Py_ssize_t hits
+        readonly Py_ssize_t misses
+
+    def __init__(self, Py_ssize_t maxsize=256):
+        self._entries = OrderedDict()
+        self.maxsize = maxsize
+        self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    cdef list _entry(self, bytes data):
+        cdef list entry = self._entries.get(data)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(data)
+            return entry
+        self.misses += 1
+        dtype, params = parse_content_disposition(data)
+        # Filename is computed lazily.
+        entry = [dtype, MappingProxyType(params), None]
+        self._entries[data] = entry
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return entry
+
+    def parse(self, bytes data):
+        cdef list entry = self._entry(data)
+        return entry[0], entry[1]
+
+    def filename(self, bytes data):
+        cdef list entry = self._entry(data)
+        if entry[2] is None:
+            entry[2] = extract_filename(entry[1])
+        return entry[2]
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = self.misses = 0
+
+
+cdef bytes _parse_boundary(bytes content_type, DispositionCache cache):
+    if cache is not None:
+        _, params = cache.parse(content_type)
+    else:
+        _, params = parse_content_disposition(content_type)
+    try:
+        return params[b'boundary']
+    except KeyError:
+        raise ValueError('Missing boundary in Content-Type.')
+
+
+cdef class PartSummary:
+
+    cdef readonly:
+        Py_ssize_t size
+        object error
+        dict digests
+
+    def __init__(self, Py_ssize_t size, error=None, dict digests=None):
+        self.size = size
+        self.error = error
+        self.digests = digests
+
+    def __repr__(self):
+        return (f'<PartSummary size={self.size} error={self.error!r} '
+                f'digests={self.digests!r}>')
+
+
+cdef class _Crc32:
+    # Same interface as the hashlib objects.
+
+    cdef unsigned long value
+
+    def update(self, data):
+        self.value = zlib.crc32(data, self.value)
+
+    def hexdigest(self):
+        return f'{self.value:08x}'
+
+
+cdef object _new_hash(str name):
+    if name == 'crc32':
+        return _Crc32()
+    return hashlib.new(name)
+
+
 cdef class Parser:
 
     cdef:
         bytes _boundary
         unsigned int _boundary_index
         unsigned int _boundary_length
+        bytes _delimiter
+        Py_ssize_t _delimiter_length
+        Py_ssize_t _skip[256]
+        bint _zero_copy
+        object _view
+        const unsigned char *_input
+        Py_ssize_t _min_data_size
+        Py_ssize_t _max_data_size
+        unsigned char *_pending
+        Py_ssize_t _pending_length
+        int _sink
+        object _sink_owner
+        object _sink_error
+        Py_ssize_t _sink_size
+        list _events
+        # Limits, 0 meaning unlimited.
+        Py_ssize_t _max_body_size
+        Py_ssize_t _max_parts
+        Py_ssize_t _max_part_size
+        Py_ssize_t _max_headers
+        Py_ssize_t _max_header_size
+        Py_ssize_t _body_size
+        Py_ssize_t _parts
+        Py_ssize_t _part_size
+        Py_ssize_t _headers
+        Py_ssize_t _header_size
+        # Statistics, since the parser creation.
+        long long _bytes_fed
+        Py_ssize_t _feed_calls
+        Py_ssize_t _calls[CALL_COUNTERS]  # By Event, then on_headers...
+        Py_ssize_t _total_parts
+        Py_ssize_t _false_starts
+        Py_ssize_t _max_header_seen
+        bint _profile
+        bint _feeding
+        long long _state_ns[19]
         unsigned char _state
-        bytes _current_header_name
-        bytes _current_header_value
+        # Current header name and value, growing across chunks.
+        unsigned char *_header
+        Py_ssize_t _header_capacity
+        Py_ssize_t _header_length
+        Py_ssize_t _header_name_length
+        bint _canonical_headers
+        bint _lower_headers
+        DispositionCache _disposition_cache
+        # Content-Transfer-Encoding of the current part, and decoder state.
+        bint _decode_transfer_encoding
+        unsigned char _encoding
+        unsigned int _decode_bits
+        int _decode_state
+        unsigned char *_decoded
+        Py_ssize_t _decoded_capacity
+        # Nested multipart bodies, parsed by a child parser sharing the
+        # handler when max_depth allows it.
+        Py_ssize_t _max_depth
+        Py_ssize_t _depth
+        bytes _nested_content_type
+        Parser _child
+        object _handler
+        # Digests of the current part data, by algorithm name.
+        tuple _digests
+        list _hashes
+        Py_ssize_t _digest_size
         _on_body_begin, _on_part_begin, _on_header, _on_headers_complete, \
-        _on_data, _on_part_complete, _on_body_complete
+        _on_data, _on_part_complete, _on_body_complete, _on_part_info, \
+        _on_headers
+        # Header block of the current part, for on_headers.
+        list _header_list
+        # FormParser handlers are called directly, not through their methods.
+        FormParser _form
+        # Filled for on_part_info.
+        bytes _part_name
+        object _part_filename
+        bytes _part_content_type
 
-    def __init__(self, handler, bytes content_type):
-        cdef dict params
-        cdef bytes _
-        _, params = parse_content_disposition(content_type)
-        try:
-            self._boundary = params[b'boundary']
-        except KeyError:
-            raise ValueError('Missing boundary in Content-Type.')
+    def __cinit__(self):
+        self._pending = NULL
+        self._header = NULL
+        self._decoded = NULL
+        self._boundary = None
+
+    def __dealloc__(self):
+        free(self._pending)
+        free(self._header)
+        free(self._decoded)
+
+    def __init__(self, handler, bytes content_type, *, bint zero_copy=False,
+                 Py_ssize_t min_data_size=0, Py_ssize_t max_data_size=0,
+                 Py_ssize_t max_body_size=0, Py_ssize_t max_parts=0,
+                 Py_ssize_t max_part_size=0, Py_ssize_t max_headers=0,
+                 Py_ssize_t max_header_size=0, bint canonical_headers=False,
+                 bint lower_headers=False, DispositionCache disposition_cache=None,
+                 bint profile=False, bint decode_transfer_encoding=False,
+                 Py_ssize_t max_depth=0, digests=None):
+        if min_data_size < 0 or max_data_size < 0:
+            raise ValueError('Data sizes must be positive.')
+        if max_data_size and min_data_size > max_data_size:
+            raise ValueError('min_data_size is greater than max_data_size.')
+        self._disposition_cache = disposition_cache
+        self._set_content_type(content_type)
+        self._zero_copy = zero_copy
+        self._view = None
+        self._min_data_size = min_data_size
+        self._max_data_size = max_data_size
+        self._max_body_size = max_body_size
+        self._max_parts = max_parts
+        self._max_part_size = max_part_size
+        self._max_headers = max_headers
+        self._max_header_size = max_header_size
+        if min_data_size:
+            self._pending = <unsigned char *>malloc(min_data_size)
+            if self._pending == NULL:
+                raise MemoryError()
+        self._header_capacity = 0
+        self._canonical_headers = canonical_headers
+        self._lower_headers = lower_headers
+        self._decode_transfer_encoding = decode_transfer_encoding
+        self._max_depth = max_depth
+        self._depth = 0
+        if digests:
+            self._digests = tuple(digests)
+            for name in self._digests:
+                _new_hash(name)  # Fail early on unknown algorithms.
+        else:
+            self._digests = None
+        self._profile = profile
+        self._feeding = False
+        self._bytes_fed = self._feed_calls = 0
+        self._total_parts = self._false_starts = self._max_header_seen = 0
+        memset(self._calls, 0, sizeof(self._calls))
+        memset(self._state_ns, 0, sizeof(self._state_ns))
+        self._reset_state()
+        self._bind(handler)
+
+    cdef _set_content_type(self, bytes content_type):
+        cdef bytes boundary = _parse_boundary(content_type,
+                                              self._disposition_cache)
+        if boundary == self._boundary:
+            return
+        self._boundary = boundary
         self._boundary_length = len(self._boundary)
-        self._current_header_name = None
-        self._current_header_value = None
-        self._state = 0
-        self._boundary_index = 0
+        # Part bodies end with CRLF + "--" + boundary.
+        self._delimiter = b'\r\n--' + self._boundary
+        self._delimiter_length = len(self._delimiter)
+        _build_skip_table(self._delimiter, self._delimiter_length, self._skip)
+
+    cdef _bind(self, handler):
+        self._handler = handler
+        self._form = handler if isinstance(handler, FormParser) else None
         self._on_body_begin = getattr(handler, 'on_body_begin', None)
         self._on_part_begin = getattr(handler, 'on_part_begin', None)
         self._on_header = getattr(handler, 'on_header', None)
+        self._on_part_info = getattr(handler, 'on_part_info', None)
+        self._on_headers = getattr(handler, 'on_headers', None)
         self._on_headers_complete = getattr(handler, 'on_headers_complete', None)
         self._on_data = getattr(handler, 'on_data', None)
         self._on_part_complete = getattr(handler, 'on_part_complete', None)
         self._on_body_complete = getattr(handler, 'on_body_complete', None)
 
-    def _maybe_call_on_header(self):
-        if self._current_header_value is not None:
-            if self._on_header is not None:
-                self._on_header(self._current_header_name, self._current_header_value)
-            self._current_header_name = self._current_header_value = None
+    cdef _reset_state(self):
+        self._state = 0
+        self._boundary_index = 0
+        self._pending_length = 0
+        self._sink = -1
+        self._sink_owner = None
+        self._sink_error = None
+        self._sink_size = 0
+        self._events = None
+        self._body_size = self._parts = self._part_size = 0
+        self._headers = self._header_size = 0
+        self._header_length = self._header_name_length = 0
+        self._encoding = IDENTITY
+        self._decode_bits = self._decode_state = 0
+        self._nested_content_type = None
+        self._child = None
+        self._header_list = None
+        self._hashes = None
+
+    @property
+    def stats(self):
+        cdef:
+            dict callbacks = {}
+            dict stats
+            int kind
+        for kind in range(len(CALLBACK_NAMES)):
+            name = CALLBACK_NAMES[kind]
+            callbacks[name] = callbacks.get(name, 0) + self._calls[kind]
+        stats = {
+            'bytes_fed': self._bytes_fed,
+            'feed_calls': self._feed_calls,
+            'callbacks': callbacks,
+            'parts': self._total_parts,
+            'false_starts': self._false_starts,
+            'max_header_size': self._max_header_seen,
+        }
+        if self._profile:
+            stats['state_ns'] = {STATE_NAMES[kind]: self._state_ns[kind]
+                                 for kind in range(len(STATE_NAMES))
+                                 if self._state_ns[kind]}
+        return stats
+
+    @property
+    def depth(self):
+        # How deep the body being parsed is nested, 0 for the outer body.
+        cdef:
+            Parser parser = self
+            Py_ssize_t depth = 0
+        while parser._child is not None:
+            parser = parser._child
+            depth += 1
+        return depth
+
+    @property
+    def part_path(self):
+        # Index of the current part in each nested body, outer body first.
+        cdef:
+            Parser parser = self
+            list path = []
+        while parser is not None and parser._parts:
+            path.append(parser._parts - 1)
+            parser = parser._child
+        return tuple(path)
+
+    def reset(self, handler=None, bytes content_type=None):
+        # Make the parser ready for a new body, keeping its options, and its
+        # handler and boundary unless new ones are given.
+        self._check_not_feeding()
+        if content_type is not None:
+            self._set_content_type(content_type)
+        self._reset_state()
+        if handler is not None:
+            self._bind(handler)
+
+    cdef _append_header(self, const unsigned char *data, Py_ssize_t length):
+        cdef:
+            Py_ssize_t capacity = self._header_capacity or 256
+            unsigned char *header
+        if self._header_length + length > self._header_capacity:
+            while capacity < self._header_length + length:
+                capacity *= 2
+            header = <unsigned char *>realloc(self._header, capacity)
+            if header == NULL:
+                raise MemoryError()
+            self._header = header
+            self._header_capacity = capacity
+        memcpy(self._header + self._header_length, data, length)
+        self._header_length += length
+
+    cdef bytes _header_name(self):
+        cdef:
+            Py_ssize_t index
+            bytes name
+        if self._canonical_headers:
+            index = _known_header(self._header, self._header_name_length)
+            if index >= 0:
+                if self._lower_headers:
+                    return KNOWN_HEADERS_LOWER[index]
+                return KNOWN_HEADERS[index]
+        name = PyBytes_FromStringAndSize(<const char *>self._header,
+                                         self._header_name_length)
+        if self._lower_headers:
+            return name.lower()
+        return name
 
-    def on_header_name(self, data):
-        self._maybe_call_on_header()
-        if self._current_header_name is None:
-            self._current_header_name = data
+    cdef _header_complete(self):
+        cdef:
+            bytes name = self._header_name()
+            bytes value = PyBytes_FromStringAndSize(
+                <const char *>self._header + self._header_name_length,
+                self._header_length - self._header_name_length)
+        if self._header_length > self._max_header_seen:
+            self._max_header_seen = self._header_length
+        if (self._decode_transfer_encoding or self._max_depth
+                or self._on_part_info is not None):
+            self._known_header_complete(
+                _known_header(self._header, self._header_name_length), value)
+        self._header_length = self._header_name_length = 0
+        if self._header_list is not None:
+            self._header_list.append((name, value))
+        if self._events is not None:
+            self._calls[<int>HEADER] += 1
+            self._events.append((<int>HEADER, name, value))
+        elif self._on_header is not None:
+            self._calls[<int>HEADER] += 1
+            self._on_header(name, value)
+
+    cdef _known_header_complete(self, Py_ssize_t index, bytes value):
+        cdef list entry
+        if index == 0 and self._on_part_info is not None:
+            if self._disposition_cache is not None:
+                entry = self._disposition_cache._entry(value)
+                params = entry[1]
+                if b'filename' in params or b'filename*' in params:
+                    if entry[2] is None:
+                        entry[2] = extract_filename(params)
+                    self._part_filename = entry[2]
+            else:
+                _, params = parse_content_disposition(value)
+                if b'filename' in params or b'filename*' in params:
+                    self._part_filename = extract_filename(params)
+            self._part_name = params.get(b'name')
+        elif index == 1:
+            self._part_content_type = value
+            if (self._max_depth
+                    and value.lstrip().lower().startswith(b'multipart/')):
+                self._nested_content_type = value
+        elif index == 2 and self._decode_transfer_encoding:
+            self._set_encoding(value)
+
+    cdef _set_encoding(self, bytes value):
+        # Other encodings (7bit, 8bit, binary) need no decoding.
+        value = value.strip().lower()
+        if value == b'base64':
+            self._encoding = BASE64
+        elif value == b'quoted-printable':
+            self._encoding = QUOTED_PRINTABLE
         else:
-            self._current_header_name += data
+            self._encoding = IDENTITY
 
-    def on_header_value(self, data):
-        if self._current_header_value is None:
-            self._current_header_value = data
+    cdef Py_ssize_t _decode(self, const unsigned char *buf,
+                            Py_ssize_t length) except -1:
+        # Decode into self._decoded, returning the decoded length.
+        cdef:
+            Py_ssize_t capacity = length + 2
+            unsigned char *decoded
+        if capacity > self._decoded_capacity:
+            decoded = <unsigned char *>realloc(self._decoded, capacity)
+            if decoded == NULL:
+                raise MemoryError()
+            self._decoded = decoded
+            self._decoded_capacity = capacity
+        if buf == NULL:  # End of the part.
+            if self._encoding == BASE64:
+                return _flush_base64(self._decoded, &self._decode_bits,
+                                     &self._decode_state)
+            return _flush_quoted_printable(self._decoded, &self._decode_bits,
+                                           &self._decode_state)
+        if length >= NOGIL_THRESHOLD:
+            with nogil:
+                if self._encoding == BASE64:
+                    length = _decode_base64(buf, length, self._decoded,
+                                            &self._decode_bits,
+                                            &self._decode_state)
+                else:
+                    length = _decode_quoted_printable(
+                        buf, length, self._decoded, &self._decode_bits,
+                        &self._decode_state)
+            return length
+        if self._encoding == BASE64:
+            return _decode_base64(buf, length, self._decoded,
+                                  &self._decode_bits, &self._decode_state)
+        return _decode_quoted_printable(buf, length, self._decoded,
+                                        &self._decode_bits,
+                                        &self._decode_state)
+
+    cdef _notify(self, int kind, callback, a=None):
+        if self._events is not None:
+            self._calls[kind] += 1
+            self._events.append((kind, a, None))
+        elif callback is not None:
+            self._calls[kind] += 1
+            if self._form is not None:
+                return self._form._notify(kind)
+            if kind == PART_COMPLETE and a is not None:
+                return callback(a)
+            return callback()
+
+    cdef _set_sink(self, sink):
+        # Handlers may return a file descriptor, or an object with a fileno
+        # method, to have the part body written to it without calling on_data.
+        if sink is None:
+            return
+        if isinstance(sink, bool):
+            raise TypeError('Part sink must be a file descriptor or have a '
+                            'fileno method, not a bool.')
+        if isinstance(sink, int):
+            self._sink = sink
+        elif hasattr(sink, 'fileno'):
+            if hasattr(sink, 'flush'):
+                sink.flush()
+            self._sink = sink.fileno()
         else:
-            self._current_header_value += data
+            raise TypeError('Part sink must be a file descriptor or have a '
+                            f'fileno method, not {type(sink).__name__}.')
+        self._sink_owner = sink
 
-    def on_headers_complete(self):
-        self._maybe_call_on_header()
-        if self._on_headers_complete is not None:
-            self._on_headers_complete()
+    cdef _write_sink(self, const unsigned char *buf, Py_ssize_t length):
+        cdef:
+            int fd = self._sink
+            ssize_t written
+        if self._sink_error is not None:
+            return
+        while length > 0:
+            with nogil:
+                written = write(fd, buf, length)
+            if written < 0:
+                if errno == EINTR:
+                    PyErr_CheckSignals()
+                    continue
+                self._sink_error = OSError(errno, strerror(errno).decode())
+                return
+            buf += written
+            length -= written
+            self._sink_size += written
+
+    cdef _add_header_size(self, Py_ssize_t size):
+        self._header_size += size
+        if self._max_header_size and self._header_size > self._max_header_size:
+            raise HeaderTooLarge(
+                f'Header is larger than {self._max_header_size} bytes.')
+
+    cdef _part_begin(self):
+        self._parts += 1
+        if self._max_parts and self._parts > self._max_parts:
+            raise TooManyParts(f'Body has more than {self._max_parts} parts.')
+        self._total_parts += 1
+        self._part_size = 0
+        self._headers = 0
+        self._encoding = IDENTITY
+        self._decode_bits = self._decode_state = 0
+        self._nested_content_type = None
+        self._part_name = self._part_filename = None
+        self._part_content_type = None
+        if self._on_headers is not None and self._events is None:
+            self._header_list = []
+        if self._digests is not None:
+            self._hashes = [_new_hash(name) for name in self._digests]
+            self._digest_size = 0
+        self._set_sink(self._notify(PART_BEGIN, self._on_part_begin))
+
+    cdef _headers_complete(self):
+        cdef list headers = self._header_list
+        if headers is not None:
+            self._header_list = None
+            self._calls[<int>ON_HEADERS_CALLS] += 1
+            if self._form is not None:
+                self._form._headers(headers)
+            else:
+                self._on_headers(headers)
+        if self._on_part_info is not None and self._events is None:
+            self._calls[<int>ON_PART_INFO_CALLS] += 1
+            if self._form is not None:
+                self._form._part_info(self._part_name, self._part_filename,
+                                      self._part_content_type)
+            else:
+                self._on_part_info(self._part_name, self._part_filename,
+                                   self._part_content_type)
+        self._set_sink(self._notify(HEADERS_COMPLETE,
+                                    self._on_headers_complete))
+        if self._nested_content_type is None or self._sink >= 0:
+            return
+        if self._depth >= self._max_depth:
+            raise NestingTooDeep(
+                f'Multipart bodies are nested more than {self._max_depth} '
+                f'levels deep.')
+        self._child = Parser(
+            self._handler, self._nested_content_type,
+            zero_copy=self._zero_copy, min_data_size=self._min_data_size,
+            max_data_size=self._max_data_size, max_parts=self._max_parts,
+            max_part_size=self._max_part_size, max_headers=self._max_headers,
+            max_header_size=self._max_header_size,
+            canonical_headers=self._canonical_headers,
+            lower_headers=self._lower_headers,
+            disposition_cache=self._disposition_cache, profile=self._profile,
+            decode_transfer_encoding=self._decode_transfer_encoding,
+            max_depth=self._max_depth, digests=self._digests)
+        self._child._depth = self._depth + 1
+
+    cdef _feed_child(self, const unsigned char *buf, Py_ssize_t start,
+                     Py_ssize_t end):
+        # Offsets and views stay relative to the chunk given to feed_data.
+        cdef Parser child = self._child
+        if self._hashes is not None:
+            self._update_digests(buf + start, end - start)
+        child._input = self._input
+        child._view = self._view
+        child._events = self._events
+        try:
+            child._feed_data(buf, end, start)
+        finally:
+            child._input = NULL
+            child._view = child._events = None
+
+    cdef _update_digests(self, const unsigned char *buf, Py_ssize_t length):
+        # hashlib and zlib read the parser buffers directly.
+        cdef object view = PyMemoryView_FromMemory(<char *>buf, length,
+                                                   PyBUF_READ)
+        for digest in self._hashes:
+            digest.update(view)
+        self._digest_size += length
 
-    cdef _feed_data(self, bytes data):
+    cdef _part_complete(self):
         cdef:
-            unsigned int i = 0
-            unsigned int mark = 0
-            char c
-            unsigned int length = len(data)
+            PartSummary summary
+            Py_ssize_t length
+            dict digests = None
+        if self._child is not None:
+            if self._child._state != EPILOGUE:
+                raise ValueError('Unexpected end of nested multipart body.')
+            self._child = None
+        if self._encoding != IDENTITY and self._has_data_consumer():
+            length = self._decode(NULL, 0)
+            if length:
+                self._merge_data(self._decoded, 0, length)
+        self._flush_data()
+        if self._hashes is not None:
+            digests = {name: digest.hexdigest()
+                       for name, digest in zip(self._digests, self._hashes)}
+            self._hashes = None
+        if self._sink >= 0:
+            summary = PartSummary(self._sink_size, self._sink_error, digests)
+            self._sink = -1
+            self._sink_owner = self._sink_error = None
+            self._sink_size = 0
+            if self._on_part_complete is not None:
+                self._calls[<int>PART_COMPLETE] += 1
+                self._on_part_complete(summary)
+        elif digests is not None:
+            # Pull mode gets the summary in the event.
+            self._notify(PART_COMPLETE, self._on_part_complete,
+                         PartSummary(self._digest_size, None, digests))
+        else:
+            self._notify(PART_COMPLETE, self._on_part_complete)
+
+    cdef _deliver_data(self, const unsigned char *buf, Py_ssize_t start,
+                       Py_ssize_t end):
+        cdef Py_ssize_t stop
+        if self._sink >= 0:
+            self._write_sink(buf + start, end - start)
+            return
+        while start < end:
+            stop = end
+            if self._max_data_size and stop - start > self._max_data_size:
+                stop = start + self._max_data_size
+            self._calls[<int>PART_DATA] += 1
+            if self._events is not None:
+                if buf == self._input:
+                    self._events.append((<int>PART_DATA, start, stop))
+                else:
+                    self._events.append((<int>PART_DATA_BYTES,
+                                         PyBytes_FromStringAndSize(
+                                             <const char *>buf + start,
+                                             stop - start), None))
+            elif self._form is not None:
+                self._form._write(PyMemoryView_FromMemory(
+                    <char *>buf + start, stop - start, PyBUF_READ))
+            elif self._view is not None and buf == self._input:
+                self._on_data(self._view[start:stop])
+            else:
+                self._on_data(PyBytes_FromStringAndSize(
+                    <const char *>buf + start, stop - start))
+            start = stop
+
+    cdef _flush_data(self):
+        cdef Py_ssize_t length = self._pending_length
+        if length:
+            self._pending_length = 0
+            self._deliver_data(self._pending, 0, length)
+
+    cdef _emit_data(self, const unsigned char *buf, Py_ssize_t start,
+                    Py_ssize_t end):
+        # Part limits apply to the data as received, before any decoding.
+        self._part_size += end - start
+        if self._max_part_size and self._part_size > self._max_part_size:
+            raise PartTooLarge(
+                f'Part is larger than {self._max_part_size} bytes.')
+        if self._child is not None:
+            self._feed_child(buf, start, end)
+            return
+        if start == end or not self._has_data_consumer():
+            return
+        if self._encoding != IDENTITY:
+            end = self._decode(buf + start, end - start)
+            buf = self._decoded
+            start = 0
+            if not end:
+                return
+        self._merge_data(buf, start, end)
+
+    cdef bint _has_data_consumer(self):
+        return (self._on_data is not None or self._sink >= 0
+                or self._events is not None or self._hashes is not None)
+
+    cdef _merge_data(self, const unsigned char *buf, Py_ssize_t start,
+                     Py_ssize_t end):
+        # Runs shorter than min_data_size are merged with the following ones
+        # until the part ends.
+        cdef Py_ssize_t length
+        if self._hashes is not None:
+            self._update_digests(buf + start, end - start)
+            if (self._on_data is None and self._sink < 0
+                    and self._events is None):
+                return
+        if self._pending_length or end - start < self._min_data_size:
+            length = self._min_data_size - self._pending_length
+            if length > end - start:
+                length = end - start
+            memcpy(self._pending + self._pending_length, buf + start, length)
+            self._pending_length += length
+            start += length
+            if self._pending_length < self._min_data_size:
+                return
+            self._flush_data()
+            if end - start < self._min_data_size:
+                memcpy(self._pending, buf + start, end - start)
+                self._pending_length = end - start
+                return
+        self._deliver_data(buf, start, end)
+
+    cdef _feed_data(self, const unsigned char *buf, Py_ssize_t length,
+                    Py_ssize_t start=0):
+        cdef:
+            Py_ssize_t i = start
+            Py_ssize_t mark = start
+            Py_ssize_t end
+            Py_ssize_t partial
+            unsigned char c
+            const unsigned char *delimiter = (
+                <const unsigned char *><const char *>self._delimiter)
+            const unsigned char *boundary = delimiter + 4
+            long long now, last = 0
+            unsigned char last_state = 0
 
         while i < length:
-            c = data[i]
+            if self._profile:
+                # Time spent in a state includes the callbacks it calls.
+                now = _now()
+                if last:
+                    self._state_ns[last_state] += now - last
+                last = now
+                last_state = self._state
+            c = buf[i]
             if self._state == PREAMBLE:
                 if c == b'-':
                     self._state = PREAMBLE_HY
@@ -102,14 +1149,14 @@ cdef class Parser:
                 i += 1
             elif self._state == FIRST_BOUNDARY:
                 while i < length:
-                    c = data[i]
+                    c = buf[i]
                     if self._boundary_index == self._boundary_length:
                         if c != b'\r':
                             raise ValueError('FIRST_BOUNDARY: \\r')
                         self._state = FIRST_BOUNDARY_DONE
                         i += 1
                         break
-                    elif c == self._boundary[self._boundary_index]:
+                    elif c == boundary[self._boundary_index]:
                         self._boundary_index += 1
                     else:
                         raise ValueError('FIRST_BOUNDARY')
@@ -117,10 +1164,8 @@ cdef class Parser:
             elif self._state == FIRST_BOUNDARY_DONE:
                 if c != b'\n':
                     raise ValueError('FIRST_BOUNDARY_DONE')
-                if self._on_body_begin is not None:
-                    self._on_body_begin()
-                if self._on_part_begin is not None:
-                    self._on_part_begin()
+                self._notify(BODY_BEGIN, self._on_body_begin, self._depth)
+                self._part_begin()
                 self._state = HEADER_NAME_START
                 i += 1
             elif self._state == HEADER_NAME_START:
@@ -128,22 +1173,30 @@ cdef class Parser:
                     self._state = HEADERS_DONE
                     i += 1
                 else:
+                    self._headers += 1
+                    if self._max_headers and self._headers > self._max_headers:
+                        raise TooManyHeaders(
+                            f'Part has more than {self._max_headers} headers.')
+                    self._header_size = 0
                     self._state = HEADER_NAME
             elif self._state == HEADER_NAME:
                 mark = i
-                while i < length:
-                    c = data[i]
-                    if c == b':':
-                        self._state = HEADER_VALUE_START
-                        break
-                    # TODO: try with a dict access when benchmarked.
-                    elif c in (b'(', b')', b'<', b'>', b'@', b',', b';',
-                               b'\\', b'"', b'/', b'[', b']', b'?', b'=', b'{',
-                               b'}', b' ', b'\t'):
+                if length - i >= NOGIL_THRESHOLD:
+                    with nogil:
+                        i = _skip_token(buf, i, length)
+                else:
+                    i = _skip_token(buf, i, length)
+                if i < length:
+                    if buf[i] != b':':
                         raise ValueError('HEADER_NAME')
-                    i += 1
+                    self._state = HEADER_VALUE_START
                 if i > mark:
-                    self.on_header_name(data[mark:i])
+                    self._add_header_size(i - mark)
+                    self._append_header(buf + mark, i - mark)
+                if self._state == HEADER_VALUE_START:
+                    if not self._header_length:
+                        raise ValueError('HEADER_NAME')
+                    self._header_name_length = self._header_length
                 i += 1
             elif self._state == HEADER_VALUE_START:
                 if c != b' ' and c != b'\t':
@@ -152,53 +1205,75 @@ cdef class Parser:
                     i += 1
             elif self._state == HEADER_VALUE:
                 mark = i
-                while i < length:
-                    c = data[i]
-                    if c == b'\r':
-                        self._state = HEADER_VALUE_CR
-                        break
-                    i += 1
+                if length - i >= NOGIL_THRESHOLD:
+                    with nogil:
+                        i = _find_byte(buf, i, length, b'\r')
+                else:
+                    i = _find_byte(buf, i, length, b'\r')
+                if i < length:
+                    self._state = HEADER_VALUE_CR
                 if i > mark:
-                    self.on_header_value(data[mark:i])
+                    self._add_header_size(i - mark)
+                    self._append_header(buf + mark, i - mark)
                 i += 1
             elif self._state == HEADER_VALUE_CR:
                 if c != b'\n':
                     raise ValueError('HEADER_VALUE_CR')
+                self._header_complete()
                 self._state = HEADER_NAME_START
                 i += 1
             elif self._state == HEADERS_DONE:
                 if c != b'\n':
                     raise ValueError('HEADERS_DONE')
-                self.on_headers_complete()
+                self._headers_complete()
                 self._state = DATA
                 i += 1
             elif self._state == DATA:
                 mark = i
-                while i < length:
-                    c = data[i]
-                    if c == b'\r':
+                if length - i >= NOGIL_THRESHOLD:
+                    with nogil:
+                        end = _find_delimiter(buf, i, length, delimiter,
+                                              self._delimiter_length,
+                                              self._skip, &partial,
+                                              &self._false_starts)
+                else:
+                    end = _find_delimiter(buf, i, length, delimiter,
+                                          self._delimiter_length, self._skip,
+                                          &partial, &self._false_starts)
+                if end >= 0:
+                    i = end + self._delimiter_length
+                    self._state = DATA_BOUNDARY_DONE
+                else:
+                    # The chunk may end with the beginning of a delimiter:
+                    # resume byte by byte from there with the next chunk.
+                    end = partial
+                    i = length
+                    if length - end == 1:
                         self._state = DATA_CR
-                        break
-                    i += 1
-                if i > mark:
-                    if self._on_data is not None:
-                        self._on_data(data[mark:i])
-                i += 1
+                    elif length - end == 2:
+                        self._state = DATA_CR_LF
+                    elif length - end == 3:
+                        self._state = DATA_CR_LF_HY
+                    elif length - end > 3:
+                        self._state = DATA_BOUNDARY
+                        self._boundary_index = length - end - 4
+                if end > mark:
+                    self._emit_data(buf, mark, end)
             elif self._state == DATA_CR:
                 if c == b'\n':
                     self._state = DATA_CR_LF
                     i += 1
                 else:
-                    if self._on_data is not None:
-                        self._on_data(b'\r')
+                    self._false_starts += 1
+                    self._emit_data(delimiter, 0, 1)
                     self._state = DATA
             elif self._state == DATA_CR_LF:
                 if c == b'-':
                     self._state = DATA_CR_LF_HY
                     i += 1
                 else:
-                    if self._on_data is not None:
-                        self._on_data(b'\r\n')
+                    self._false_starts += 1
+                    self._emit_data(delimiter, 0, 2)
                     self._state = DATA
             elif self._state == DATA_CR_LF_HY:
                 if c == b'-':
@@ -206,22 +1281,22 @@ cdef class Parser:
                     self._boundary_index = 0
                     i += 1
                 else:
-                    if self._on_data is not None:
-                        self._on_data(b'\r\n-')
+                    self._false_starts += 1
+                    self._emit_data(delimiter, 0, 3)
                     self._state = DATA
             elif self._state == DATA_BOUNDARY:
                 while i < length:
-                    c = data[i]
+                    c = buf[i]
                     if self._boundary_index == self._boundary_length:
                         self._state = DATA_BOUNDARY_DONE
                         break
-                    elif c == self._boundary[self._boundary_index]:
+                    elif c == boundary[self._boundary_index]:
                         self._boundary_index += 1
                         i += 1
                     else:
-                        if self._on_data is not None:
-                            self._on_data(b'\r\n--')
-                            self._on_data(self._boundary[:self._boundary_index])
+                        self._false_starts += 1
+                        self._emit_data(delimiter, 0,
+                                        4 + self._boundary_index)
                         self._state = DATA
                         break
             elif self._state == DATA_BOUNDARY_DONE:
@@ -235,90 +1310,1144 @@ cdef class Parser:
             elif self._state == DATA_BOUNDARY_DONE_CR_LF:
                 if c != b'\n':
                     raise ValueError('DATA_BOUNDARY_DONE_CR_LF')
-                if self._on_part_complete is not None:
-                    self._on_part_complete()
-                if self._on_part_begin is not None:
-                    self._on_part_begin()
+                self._part_complete()
+                self._part_begin()
                 self._state = HEADER_NAME_START
                 i += 1
             elif self._state == DATA_BOUNDARY_DONE_HY_HY:
                 if c != b'-':
                     raise ValueError('DATA_BOUNDARY_DONE_HY_HY')
-                if self._on_part_complete is not None:
-                    self._on_part_complete()
-                if self._on_body_complete is not None:
-                    self._on_body_complete()
+                self._part_complete()
+                self._notify(BODY_COMPLETE, self._on_body_complete,
+                             self._depth)
                 self._state = EPILOGUE
                 i += 1
             elif self._state == EPILOGUE:
                 i += 1
                 # Must be ignored according to rfc 1341.
                 break
+        if last:
+            self._state_ns[last_state] += _now() - last
+
+    cdef _check_not_feeding(self):
+        # The GIL is released while scanning large chunks: a parser must not
+        # be used by several threads at once, nor from its own callbacks.
+        if self._feeding:
+            raise RuntimeError('Parser is already parsing data.')
+
+    def feed_data(self, data):
+        # Any contiguous buffer is accepted (bytes, bytearray, memoryview…).
+        cdef Py_buffer view
+        self._check_not_feeding()
+        PyObject_GetBuffer(data, &view, PyBUF_SIMPLE)
+        self._feeding = True
+        try:
+            self._feed_calls += 1
+            self._bytes_fed += view.len
+            self._body_size += view.len
+            if self._max_body_size and self._body_size > self._max_body_size:
+                raise BodyTooLarge(
+                    f'Body is larger than {self._max_body_size} bytes.')
+            if self._zero_copy:
+                self._view = memoryview(data).cast('B')
+            self._input = <const unsigned char *>view.buf
+            self._feed_data(self._input, view.len)
+        finally:
+            self._feeding = False
+            self._view = None
+            self._input = NULL
+            PyBuffer_Release(&view)
+
+    def feed(self, data):
+        # Pull mode: return the events for this chunk as a list of
+        # (Event, a, b) tuples instead of calling the handler.
+        self._check_not_feeding()
+        self._events = []
+        try:
+            self.feed_data(data)
+            return self._events
+        finally:
+            self._events = None
+
+    def feed_eof(self):
+        # The body is over: it must not stop before its closing boundary,
+        # which an empty body does not have either.
+        self._check_not_feeding()
+        if self._state != EPILOGUE:
+            raise ValueError('Unexpected end of multipart body.')
+
+
+cdef class UrlencodedParser:
+    # application/x-www-form-urlencoded bodies, with a Parser-like handler:
+    # on_body_begin, on_field(name, value) and on_body_complete. As there is
+    # no closing delimiter, feed_eof must be called at the end of the body.
+
+    cdef:
+        # Current field, decoded: name, then value from _name_length on.
+        unsigned char *_field
+        Py_ssize_t _field_capacity
+        Py_ssize_t _field_length
+        Py_ssize_t _name_length  # -1 until "=" is found.
+        Py_ssize_t _field_size  # Encoded.
+        int _percent  # 1 after "%", 2 after "%" and a hex digit.
+        unsigned char _digit
+        bint _feeding
+        Py_ssize_t _max_body_size
+        Py_ssize_t _max_fields
+        Py_ssize_t _max_field_size
+        Py_ssize_t _body_size
+        Py_ssize_t _fields
+        _on_body_begin, _on_field, _on_body_complete
+
+    def __cinit__(self):
+        self._field = NULL
+
+    def __dealloc__(self):
+        free(self._field)
+
+    def __init__(self, handler, *, Py_ssize_t max_body_size=0,
+                 Py_ssize_t max_fields=0, Py_ssize_t max_field_size=0):
+        self._max_body_size = max_body_size
+        self._max_fields = max_fields
+        self._max_field_size = max_field_size
+        self._field_capacity = 0
+        self._feeding = False
+        self._reset_state()
+        self._bind(handler)
+
+    cdef _bind(self, handler):
+        self._on_body_begin = getattr(handler, 'on_body_begin', None)
+        self._on_field = getattr(handler, 'on_field', None)
+        self._on_body_complete = getattr(handler, 'on_body_complete', None)
+
+    cdef _reset_state(self):
+        self._field_length = self._field_size = 0
+        self._name_length = -1
+        self._percent = 0
+        self._body_size = self._fields = 0
+
+    def reset(self, handler=None):
+        self._check_not_feeding()
+        self._reset_state()
+        if handler is not None:
+            self._bind(handler)
+
+    cdef _check_not_feeding(self):
+        if self._feeding:
+            raise RuntimeError('Parser is already parsing data.')
+
+    cdef _append(self, const unsigned char *data, Py_ssize_t length):
+        cdef:
+            Py_ssize_t capacity = self._field_capacity or 256
+            unsigned char *field
+        if self._field_length + length > self._field_capacity:
+            while capacity < self._field_length + length:
+                capacity *= 2
+            field = <unsigned char *>realloc(self._field, capacity)
+            if field == NULL:
+                raise MemoryError()
+            self._field = field
+            self._field_capacity = capacity
+        memcpy(self._field + self._field_length, data, length)
+        self._field_length += length
+
+    cdef _add_field_size(self, Py_ssize_t size):
+        self._field_size += size
+        if self._max_field_size and self._field_size > self._max_field_size:
+            raise FieldTooLarge(
+                f'Field is larger than {self._max_field_size} bytes.')
+
+    cdef _flush_percent(self):
+        # Invalid escapes are kept as is.
+        cdef unsigned char escape[2]
+        if self._percent:
+            escape[0] = b'%'
+            escape[1] = self._digit
+            self._append(escape, self._percent)
+            self._percent = 0
+
+    cdef _field_complete(self):
+        # Empty fields, as in "a=1&&b=2", are skipped.
+        cdef:
+            Py_ssize_t name_length = self._name_length
+            bytes name, value
+        self._flush_percent()
+        if not self._field_length and name_length < 0:
+            return
+        self._fields += 1
+        if self._max_fields and self._fields > self._max_fields:
+            raise TooManyFields(
+                f'Body has more than {self._max_fields} fields.')
+        if name_length < 0:
+            name_length = self._field_length
+        name = PyBytes_FromStringAndSize(<const char *>self._field,
+                                         name_length)
+        value = PyBytes_FromStringAndSize(
+            <const char *>self._field + name_length,
+            self._field_length - name_length)
+        self._field_length = self._field_size = 0
+        self._name_length = -1
+        if self._on_field is not None:
+            self._on_field(name, value)
+
+    cdef _feed_data(self, const unsigned char *buf, Py_ssize_t length):
+        # Field sizes are checked before each byte or run is buffered, so an
+        # oversized field never gets fully copied.
+        cdef:
+            Py_ssize_t i = 0
+            Py_ssize_t mark
+            unsigned char c
+        while i < length:
+            c = buf[i]
+            if self._percent == 1:
+                if HEX_VALUE[c] >= 0:
+                    self._add_field_size(1)
+                    self._digit = c
+                    self._percent = 2
+                    i += 1
+                else:
+                    self._flush_percent()
+            elif self._percent == 2:
+                if HEX_VALUE[c] >= 0:
+                    self._add_field_size(1)
+                    c = (HEX_VALUE[self._digit] << 4) | HEX_VALUE[c]
+                    self._percent = 0
+                    self._append(&c, 1)
+                    i += 1
+                else:
+                    self._flush_percent()
+            elif c == b'&':
+                self._field_complete()
+                i += 1
+            elif c == b'=' and self._name_length < 0:
+                self._add_field_size(1)
+                self._name_length = self._field_length
+                i += 1
+            elif c == b'%':
+                self._add_field_size(1)
+                self._percent = 1
+                i += 1
+            elif c == b'+':
+                self._add_field_size(1)
+                c = b' '
+                self._append(&c, 1)
+                i += 1
+            else:
+                mark = i
+                i += 1
+                while i < length and not URLENCODED_SPECIAL[buf[i]]:
+                    i += 1
+                self._add_field_size(i - mark)
+                self._append(buf + mark, i - mark)
+
+    def feed_data(self, data):
+        cdef Py_buffer view
+        self._check_not_feeding()
+        PyObject_GetBuffer(data, &view, PyBUF_SIMPLE)
+        self._feeding = True
+        try:
+            if not view.len:
+                return
+            if not self._body_size and self._on_body_begin is not None:
+                self._on_body_begin()
+            self._body_size += view.len
+            if self._max_body_size and self._body_size > self._max_body_size:
+                raise BodyTooLarge(
+                    f'Body is larger than {self._max_body_size} bytes.')
+            self._feed_data(<const unsigned char *>view.buf, view.len)
+        finally:
+            self._feeding = False
+            PyBuffer_Release(&view)
+
+    def feed_eof(self):
+        self._check_not_feeding()
+        if not self._body_size:
+            return
+        self._feeding = True
+        try:
+            self._field_complete()
+            if self._on_body_complete is not None:
+                self._on_body_complete()
+        finally:
+            self._feeding = False
+
+
+# Options only meaningful to one of the parsers, which create_parser drops
+# for the other one.
+cdef frozenset MULTIPART_OPTIONS = frozenset((
+    'zero_copy', 'min_data_size', 'max_data_size', 'max_parts',
+    'max_part_size', 'max_headers', 'max_header_size', 'canonical_headers',
+    'lower_headers', 'disposition_cache', 'profile',
+    'decode_transfer_encoding', 'max_depth', 'digests'))
+cdef frozenset URLENCODED_OPTIONS = frozenset(('max_fields', 'max_field_size'))
+
+
+def create_parser(handler, bytes content_type, **options):
+    # Parser or UrlencodedParser, depending on the content type; feed_eof
+    # must be called at the end of the body in both cases. Options may mix
+    # those of both parsers.
+    cdef bytes mimetype = content_type.split(b';', 1)[0].strip().lower()
+    if mimetype == b'application/x-www-form-urlencoded':
+        return UrlencodedParser(handler, **{
+            name: value for name, value in options.items()
+            if name not in MULTIPART_OPTIONS})
+    if mimetype.startswith(b'multipart/'):
+        return Parser(handler, content_type, **{
+            name: value for name, value in options.items()
+            if name not in URLENCODED_OPTIONS})
+    raise ValueError(
+        f'Unsupported content type: {mimetype.decode("latin-1")}.')
 
-    def feed_data(self, bytes data):
-        return self._feed_data(data)
+
+cdef _set_param(dict params, bytes field, bytes data, Py_ssize_t start,
+                Py_ssize_t end, bint escaped):
+    cdef bytes value = data[start:end]
+    if escaped:
+        value = value.replace(b'\\', b'')
+    params[field.lower()] = value
+
+
+cdef _join_continuations(dict params):
+    # RFC 2231: name*0="foo"; name*1="bar" is name="foobar", and with
+    # name*0*=utf-8''foo it is the extended name* value.
+    cdef:
+        dict sections = {}
+        list section
+        bytes key, name, number, value
+        bint extended
+    for key in list(params):
+        name, _, number = key.partition(b'*')
+        extended = number.endswith(b'*')
+        if extended:
+            number = number[:-1]
+        if not number.isdigit():
+            continue
+        if len(number) > 1 and number.startswith(b'0'):
+            # Leading zeros are not allowed: ignore the section.
+            del params[key]
+            continue
+        sections.setdefault(name, []).append(
+            (int(number), extended, params.pop(key)))
+    for name, section in sections.items():
+        section.sort()
+        if section[0][0] != 0:
+            continue
+        extended = section[0][1]
+        value = b''
+        for index, (position, part_extended, part) in enumerate(section):
+            if position != index:
+                break
+            if extended and not part_extended:
+                part = part.replace(b'%', b'%25')
+            value += part
+        params.setdefault(name + b'*' if extended else name, value)
 
 
 cpdef parse_content_disposition(bytes data):
     cdef:
         bytes dtype = None
         dict params = {}
-        unsigned int length = len(data)
-        unsigned int start = 0
-        unsigned int end = 0
-        unsigned int i = 0
-        bool quoted = False
-        char c
-        bytes previous = b''
+        Py_ssize_t length = len(data)
+        Py_ssize_t start = 0
+        Py_ssize_t end = 0
+        Py_ssize_t i = 0
+        const unsigned char *buf = <const unsigned char *><const char *>data
+        unsigned char cls
+        bint quoted = False
+        bint escaped = False  # Value has a backslash.
+        bint continued = False
         bytes field = None
     while i < length:
-        c = data[i]
-        if not quoted and c == b';':
+        cls = CHAR_CLASS[buf[i]]
+        if cls & SEMICOLON and not quoted:
             if dtype is None:
-                dtype = data[start:end]
+                dtype = data[start:end].lower()
             elif field is not None:
-                params[field.lower()] = data[start:end].replace(b'\\', b'')
+                _set_param(params, field, data, start, end, escaped)
                 field = None
             i += 1
             start = end = i
-        elif c == b'"':
+            escaped = False
+        elif cls & QUOTE:
             i += 1
-            if not previous or previous != b'\\':
+            if i < 2 or not CHAR_CLASS[buf[i - 2]] & BACKSLASH:
                 if not quoted:
                     start = i
                 quoted = not quoted
             else:
                 end = i
-        elif c == b'=':
+        elif cls & EQUAL and not quoted:
             field = data[start:end]
+            if not continued and b'*' in field:
+                continued = True
             i += 1
             start = end = i
-        elif c == b' ':
+            escaped = False
+        elif cls & SPACE:
             i += 1
             if not quoted and start == end:  # Leading spaces.
                 start = end = i
         else:
+            if cls & BACKSLASH:
+                escaped = True
             i += 1
             end = i
-        previous = c
-    if i:
+    if length:
         if dtype is None:
             dtype = data[start:end].lower()
         elif field is not None:
-            params[field.lower()] = data[start:end].replace(b'\\', b'')
+            _set_param(params, field, data, start, end, escaped)
+    if continued:
+        _join_continuations(params)
     return dtype, params
 
 
-def extract_filename(params: dict):
+def extract_filename(params):
     if b'filename*' in params:
         filename = params.get(b'filename*')
         if b"''" in filename:
-            encoding, filename = filename.split(b"''")
+            encoding, filename = filename.split(b"''", 1)
             try:
-                return filename.decode(encoding.decode())
+                return unquote_to_bytes(filename).decode(encoding.decode())
             except (LookupError, UnicodeDecodeError):
                 pass
         if b'filename' in params:
             return params.get(b'filename').decode()
         return filename.decode(errors='ignore')
     return params.get(b'filename', b'').decode()
+
+
+cdef class ParserPool:
+
+    cdef:
+        object _local
+        Py_ssize_t _maxsize
+        dict _options
+
+    def __init__(self, Py_ssize_t maxsize=16, **options):
+        self._local = local()
+        self._maxsize = maxsize
+        self._options = options
+
+    cdef list _parsers(self):
+        try:
+            return self._local.parsers
+        except AttributeError:
+            self._local.parsers = []
+            return self._local.parsers
+
+    def acquire(self, handler, bytes content_type):
+        cdef:
+            list parsers = self._parsers()
+            Parser parser
+        if parsers:
+            parser = parsers.pop()
+            parser.reset(handler, content_type)
+            return parser
+        return Parser(handler, content_type, **self._options)
+
+    def release(self, Parser parser not None):
+        cdef list parsers = self._parsers()
+        parser._check_not_feeding()
+        # Do not keep the handler alive while the parser is pooled.
+        parser._bind(None)
+        parser._reset_state()
+        if len(parsers) < self._maxsize:
+            parsers.append(parser)
+
+
+cdef class FormPart:
+
+    cdef readonly:
+        dict headers
+        bytes name
+        str filename
+        bytes content_type
+        bytes value
+        object file
+
+    def __init__(self):
+        self.headers = {}
+        self.name = None
+        self.filename = None
+        self.content_type = None
+        self.value = None
+        self.file = None
+
+    def __repr__(self):
+        if self.file is not None:
+            return f'<FormPart {self.name!r} filename={self.filename!r}>'
+        return f'<FormPart {self.name!r}>'
+
+
+cdef class FormParser:
+
+    cdef:
+        Parser _parser
+        Py_ssize_t _max_memory_size
+        Py_ssize_t _max_field_size
+        object _spool_dir
+        FormPart _part
+        bytearray _value
+        readonly list fields
+        readonly list files
+
+    def __init__(self, bytes content_type, *,
+                 Py_ssize_t max_memory_size=1024 * 1024,
+                 Py_ssize_t max_field_size=1024 * 1024, spool_dir=None,
+                 **options):
+        if options.get('max_depth'):
+            # Parts of nested bodies would replace the part they belong to.
+            raise ValueError('FormParser does not parse nested bodies.')
+        options.setdefault('zero_copy', True)
+        self._parser = Parser(self, content_type, **options)
+        self._max_memory_size = max_memory_size
+        self._max_field_size = max_field_size
+        self._spool_dir = spool_dir
+        self._part = None
+        self._value = None
+        self.fields = []
+        self.files = []
+
+    def feed_data(self, data):
+        self._parser.feed_data(data)
+
+    def feed_eof(self):
+        # Raises ValueError if the body stopped before its closing boundary.
+        self._parser.feed_eof()
+
+    def close(self):
+        cdef FormPart part
+        for part in self.files:
+            part.file.close()
+        # The part being parsed when the body stopped.
+        if self._part is not None and self._part.file is not None:
+            self._part.file.close()
+
+    # Parser calls the cdef methods below directly; the handler methods are
+    # only there for it to know which events to produce.
+
+    def on_part_begin(self):
+        self._notify(PART_BEGIN)
+
+    def on_headers(self, list headers):
+        self._headers(headers)
+
+    def on_part_info(self, bytes name, filename, bytes content_type):
+        self._part_info(name, filename, content_type)
+
+    def on_headers_complete(self):
+        self._notify(HEADERS_COMPLETE)
+
+    def on_data(self, data):
+        self._write(data)
+
+    def on_part_complete(self, summary=None):
+        self._notify(PART_COMPLETE)
+
+    cdef FormPart _current_part(self):
+        if self._part is None:
+            raise RuntimeError('No part is being parsed.')
+        return self._part
+
+    cdef _notify(self, int kind):
+        cdef FormPart part
+        if kind == PART_BEGIN:
+            self._part = FormPart()
+        elif kind == HEADERS_COMPLETE:
+            part = self._current_part()
+            if part.filename is None:
+                self._value = bytearray()
+            else:
+                # Files stay in memory up to max_memory_size, then roll over
+                # to disk.
+                part.file = SpooledTemporaryFile(
+                    max_size=self._max_memory_size, dir=self._spool_dir)
+        elif kind == PART_COMPLETE:
+            part = self._current_part()
+            if part.file is not None:
+                part.file.seek(0)
+                self.files.append(part)
+            else:
+                part.value = bytes(self._value)
+                self._value = None
+                self.fields.append(part)
+            self._part = None
+
+    cdef _headers(self, list headers):
+        self._current_part().headers.update(headers)
+
+    cdef _part_info(self, bytes name, filename, bytes content_type):
+        cdef FormPart part = self._current_part()
+        part.name = name
+        part.filename = filename
+        part.content_type = content_type
+
+    cdef _write(self, data):
+        cdef FormPart part = self._current_part()
+        if self._value is not None:
+            # Fields are kept in memory, files are the ones spooled to disk.
+            if (self._max_field_size and
+                    len(self._value) + len(data) > self._max_field_size):
+                raise FieldTooLarge(
+                    f'Field is larger than {self._max_field_size} bytes.')
+            self._value += data
+        elif part.file is not None:
+            part.file.write(data)
+        else:
+            raise RuntimeError('Part headers are not complete.')
+
+
+def parse_form(body, bytes content_type, **options):
+    form = FormParser(content_type, **options)
+    try:
+        form.feed_data(body)
+        form.feed_eof()
+    except BaseException:
+        form.close()
+        raise
+    return form.fields, form.files
+
+
+def parse_stream(fileobj, handler, bytes content_type, *,
+                 Py_ssize_t buffer_size=64 * 1024, content_length=None,
+                 **options):
+    # Feed the parser from a blocking file object (wsgi.input…), read into
+    # one buffer reused for every chunk, and stop at content_length when
+    # given. Returns the parser.
+    cdef:
+        Py_ssize_t remaining = -1
+        Py_ssize_t size, read
+    if buffer_size <= 0:
+        raise ValueError('buffer_size must be positive.')
+    if content_length is not None:
+        remaining = int(content_length)
+        if remaining < 0:
+            raise ValueError('Invalid Content-Length.')
+    parser = create_parser(handler, content_type, **options)
+    readinto = getattr(fileobj, 'readinto', None)
+    buffer = memoryview(bytearray(buffer_size))
+    while remaining:
+        size = buffer_size
+        if 0 < remaining < buffer_size:
+            size = remaining
+        if readinto is not None:
+            read = readinto(buffer[:size]) or 0
+            data = buffer[:read]
+        else:
+            data = fileobj.read(size)
+            read = len(data)
+        if not read:
+            if remaining > 0:
+                raise ValueError('Body is shorter than its Content-Length.')
+            break
+        parser.feed_data(data)
+        if remaining > 0:
+            remaining -= read
+    parser.feed_eof()
+    return parser
+
+
+cdef class BodyPart:
+
+    cdef:
+        object _view
+        list _headers
+        int _fd
+        object _file
+    cdef readonly:
+        Py_ssize_t headers_start
+        Py_ssize_t headers_end
+        Py_ssize_t data_start
+        Py_ssize_t data_end
+
+    @property
+    def headers(self):
+        # Parsed on first access, checked by _index_body already.
+        cdef:
+            bytes block, line, name, value
+        if self._headers is None:
+            self._check_open()
+            self._headers = []
+            block = bytes(self._view[self.headers_start:self.headers_end])
+            for line in block.split(b'\r\n') if block else ():
+                name, _, value = line.partition(b':')
+                self._headers.append((name, value.lstrip(b' \t')))
+        return self._headers
+
+    def __cinit__(self):
+        self._fd = -1
+
+    cdef _check_open(self):
+        if self._view is None:
+            raise ValueError('Body is closed.')
+
+    @property
+    def data(self):
+        self._check_open()
+        return self._view[self.data_start:self.data_end]
+
+    def copy_to(self, dest):
+        # Write the data to dest (a file descriptor or an object with a
+        # fileno()) at its current position, within the kernel when the part
+        # comes from parse_file. Returns the number of bytes written.
+        cdef Py_ssize_t offset = self.data_start, sent
+        self._check_open()
+        if isinstance(dest, int):
+            out = dest
+        else:
+            # Pending buffered writes must land before ours.
+            if hasattr(dest, 'flush'):
+                dest.flush()
+            out = dest.fileno()
+        if self._fd >= 0 and hasattr(os, 'copy_file_range'):
+            try:
+                while offset < self.data_end:
+                    sent = os.copy_file_range(self._fd, out,
+                                              self.data_end - offset,
+                                              offset_src=offset)
+                    if not sent:
+                        break
+                    offset += sent
+            except OSError as e:
+                if e.errno not in _COPY_FALLBACK:
+                    raise
+        if self._fd >= 0 and offset < self.data_end:
+            try:
+                while offset < self.data_end:
+                    sent = os.sendfile(out, self._fd, offset,
+                                       self.data_end - offset)
+                    if not sent:
+                        break
+                    offset += sent
+            except OSError as e:
+                if e.errno not in _COPY_FALLBACK:
+                    raise
+        while offset < self.data_end:
+            offset += os.write(out, self._view[offset:self.data_end])
+        return self.data_end - self.data_start
+
+    def __repr__(self):
+        return (f'<BodyPart headers={self.headers_start}:{self.headers_end} '
+                f'data={self.data_start}:{self.data_end}>')
+
+
+cdef _check_headers(const unsigned char *buf, Py_ssize_t start,
+                    Py_ssize_t end):
+    # Same checks as Parser, for parse_body to reject the same header blocks.
+    cdef Py_ssize_t i
+    while start < end:
+        i = _skip_token(buf, start, end)
+        if i == start or i == end or buf[i] != b':':
+            raise ValueError('HEADER_NAME')
+        i = _find_byte(buf, i, end, b'\r')
+        if i == end:
+            return
+        if i + 1 == end or buf[i + 1] != b'\n':
+            raise ValueError('HEADER_VALUE_CR')
+        start = i + 2
+
+
+cdef list _index_body(object view, const unsigned char *buf,
+                      Py_ssize_t length, bytes boundary):
+    cdef:
+        bytes delimiter = b'\r\n--' + boundary
+        const unsigned char *needle = delimiter
+        Py_ssize_t needle_length = len(delimiter)
+        Py_ssize_t table[256]
+        Py_ssize_t pos, found
+        list parts = []
+        BodyPart part
+    if not length:
+        raise ValueError('Unexpected end of multipart body.')
+    _build_skip_table(needle, needle_length, table)
+    # The first boundary has no leading CRLF when there is no preamble.
+    if (length >= needle_length - 2
+            and memcmp(buf, needle + 2, needle_length - 2) == 0):
+        pos = needle_length - 2
+    else:
+        with nogil:
+            pos = _find(buf, 0, length, needle, needle_length, table, NULL)
+        if pos < 0:
+            raise ValueError('FIRST_BOUNDARY')
+        pos += needle_length
+    while True:
+        if pos + 2 > length:
+            raise ValueError('Unexpected end of multipart body.')
+        if buf[pos] == b'-' and buf[pos + 1] == b'-':
+            # Epilogue is ignored.
+            return parts
+        if buf[pos] != b'\r' or buf[pos + 1] != b'\n':
+            raise ValueError('DATA_BOUNDARY_DONE')
+        part = BodyPart.__new__(BodyPart)
+        part._view = view
+        part.headers_start = pos + 2
+        if (length >= pos + 4 and buf[pos + 2] == b'\r'
+                and buf[pos + 3] == b'\n'):
+            part.headers_end = pos + 2
+            part.data_start = pos + 4
+        else:
+            found = _find_short(buf, pos + 2, length,
+                                <const unsigned char *>b'\r\n\r\n', 4)
+            if found < 0:
+                raise ValueError('Unexpected end of multipart body.')
+            _check_headers(buf, pos + 2, found)
+            part.headers_end = found
+            part.data_start = found + 4
+        if length - part.data_start >= NOGIL_THRESHOLD:
+            with nogil:
+                found = _find(buf, part.data_start, length, needle,
+                              needle_length, table, NULL)
+        else:
+            found = _find(buf, part.data_start, length, needle,
+                          needle_length, table, NULL)
+        if found < 0:
+            raise ValueError('Unexpected end of multipart body.')
+        part.data_end = found
+        parts.append(part)
+        pos = found + needle_length
+
+
+def parse_body(body, bytes content_type):
+    # Index all the parts of a body held in memory at once; their data are
+    # memoryviews of body.
+    cdef:
+        Py_buffer buffer
+        bytes boundary = _parse_boundary(content_type, None)
+    view = memoryview(body).cast('B')
+    PyObject_GetBuffer(view, &buffer, PyBUF_SIMPLE)
+    try:
+        return _index_body(view, <const unsigned char *>buffer.buf,
+                           buffer.len, boundary)
+    finally:
+        PyBuffer_Release(&buffer)
+
+
+class MappedParts(list):
+    # The parts returned by parse_file, which keep the file and its mmap open
+    # until closed.
+
+    def __init__(self, parts, view, mapped, file):
+        super().__init__(parts)
+        self._view = view
+        self._mapped = mapped
+        self._file = file
+
+    def close(self):
+        # Data taken from the parts must have been released: the mmap can
+        # not be closed while they point to it.
+        cdef BodyPart part
+        for part in self:
+            part._view = None
+            part._fd = -1
+            part._file = None
+        try:
+            if self._mapped is not None:
+                self._view.release()
+                self._mapped.close()
+                self._mapped = None
+        finally:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def parse_file(file, bytes content_type):
+    # Index the parts of a body spooled to disk, given its path or a file
+    # descriptor (which must stay open to use BodyPart.copy_to), through a
+    # read-only mmap: the data are only paged in when accessed.
+    cdef:
+        Py_buffer buffer
+        bytes boundary = _parse_boundary(content_type, None)
+        list parts
+        BodyPart part
+        int fd
+    owned = mapped = view = None
+    if isinstance(file, int):
+        fd = file
+    else:
+        owned = open(file, 'rb')
+        fd = owned.fileno()
+    try:
+        size = os.fstat(fd).st_size
+        if not size:
+            # Empty files can not be mapped.
+            raise ValueError('Unexpected end of multipart body.')
+        mapped = mmap.mmap(fd, size, access=mmap.ACCESS_READ)
+        if hasattr(mmap, 'MADV_SEQUENTIAL'):
+            mapped.madvise(mmap.MADV_SEQUENTIAL)
+        view = memoryview(mapped)
+        PyObject_GetBuffer(view, &buffer, PyBUF_SIMPLE)
+        try:
+            parts = _index_body(view, <const unsigned char *>buffer.buf,
+                                buffer.len, boundary)
+        finally:
+            PyBuffer_Release(&buffer)
+    except BaseException:
+        if mapped is not None:
+            if view is not None:
+                view.release()
+            mapped.close()
+        if owned is not None:
+            owned.close()
+        raise
+    for part in parts:
+        part._fd = fd
+        part._file = owned
+    return MappedParts(parts, view, mapped, owned)
+
+
+cdef bytes _quote(bytes value):
+    # RFC 7230 quoted-string.
+    return b'"' + value.replace(b'\\', b'\\\\').replace(b'"', b'\\"') + b'"'
+
+
+cdef bytes _to_bytes(value):
+    if isinstance(value, str):
+        return value.encode()
+    return bytes(value)
+
+
+cdef class MultipartWriter:
+    # Encode a multipart body, to be sent as an iterator of chunks: bytes-like
+    # data are yielded as they are, and files are read chunk by chunk.
+
+    cdef readonly:
+        bytes boundary
+        bytes content_type
+    cdef:
+        Py_ssize_t _chunk_size
+        list _parts  # (headers block, data, size, is_file)
+
+    def __init__(self, bytes boundary=None, bytes subtype=b'form-data', *,
+                 Py_ssize_t chunk_size=64 * 1024):
+        cdef const unsigned char *buf
+        cdef Py_ssize_t i
+        if boundary is None:
+            boundary = os.urandom(16).hex().encode()
+        if (not 0 < len(boundary) <= 70 or b'\r' in boundary
+                or b'\n' in boundary):
+            raise ValueError('Invalid boundary.')
+        if chunk_size <= 0:
+            raise ValueError('chunk_size must be positive.')
+        self.boundary = boundary
+        buf = boundary
+        for i in range(len(boundary)):
+            if not CHAR_CLASS[buf[i]] & TOKEN:
+                boundary = _quote(boundary)
+                break
+        self.content_type = b'multipart/' + subtype + b'; boundary=' + boundary
+        self._chunk_size = chunk_size
+        self._parts = []
+
+    def add_part(self, data, headers=(), *, size=None):
+        # data is a bytes-like object or a binary file, read from its current
+        # position; size is only needed for unseekable files.
+        cdef:
+            list lines = [b'\r\n--' if self._parts else b'--', self.boundary,
+                          b'\r\n']
+            bint is_file = hasattr(data, 'read')
+        for name, value in headers:
+            if (b'\r' in name or b'\n' in name or b':' in name
+                    or b'\r' in value or b'\n' in value):
+                raise ValueError('Invalid header.')
+            lines += [name, b': ', value, b'\r\n']
+        lines.append(b'\r\n')
+        if size is None:
+            if is_file:
+                try:
+                    position = data.tell()
+                    size = data.seek(0, 2) - position
+                    data.seek(position)
+                except (AttributeError, OSError):
+                    raise ValueError('size is required for unseekable files.')
+            else:
+                size = memoryview(data).nbytes
+        self._parts.append((b''.join(lines), data, size, is_file))
+
+    def add_field(self, name, value, bytes content_type=None):
+        cdef list headers = [(b'Content-Disposition',
+                              b'form-data; name=' + _quote(_to_bytes(name)))]
+        if content_type is not None:
+            headers.append((b'Content-Type', content_type))
+        self.add_part(_to_bytes(value) if isinstance(value, str) else value,
+                      headers)
+
+    def add_file(self, name, file, filename=None,
+                 bytes content_type=b'application/octet-stream', *, size=None):
+        # Filenames that are not plain ASCII also get an RFC 2231 filename*,
+        # which extract_filename prefers.
+        cdef bytes disposition = b'form-data; name=' + _quote(_to_bytes(name))
+        if filename is not None:
+            if isinstance(filename, bytes):
+                filename = filename.decode()
+            fallback = filename.encode('ascii', 'replace')
+            disposition += b'; filename=' + _quote(fallback)
+            if (fallback.decode() != filename or b'"' in fallback
+                    or b'\\' in fallback):
+                disposition += (b"; filename*=utf-8''" + quote_from_bytes(
+                    filename.encode(), safe="!#$&+-.^_`|~").encode())
+        self.add_part(file, [(b'Content-Disposition', disposition),
+                             (b'Content-Type', content_type)], size=size)
+
+    cdef bytes _closing(self):
+        return ((b'\r\n--' if self._parts else b'--') + self.boundary
+                + b'--\r\n')
+
+    @property
+    def content_length(self):
+        cdef Py_ssize_t length = len(self._closing())
+        for headers, _, size, _ in self._parts:
+            length += len(headers) + size
+        return length
+
+    def __iter__(self):
+        # Files are consumed: the body can only be iterated once if it has
+        # any.
+        cdef Py_ssize_t remaining
+        for headers, data, size, is_file in self._parts:
+            yield headers
+            if not is_file:
+                if size:
+                    yield data
+                continue
+            remaining = size
+            while remaining:
+                chunk = data.read(min(self._chunk_size, remaining))
+                if not chunk:
+                    raise ValueError('File is shorter than its size.')
+                remaining -= len(chunk)
+                yield chunk
+        yield self._closing()
+
+
+class _StreamSource:
+
+    def __init__(self, stream, chunk_size):
+        self._stream = stream
+        self._chunk_size = chunk_size
+
+    async def read(self):
+        return await self._stream.read(self._chunk_size)
+
+
+class _ASGISource:
+
+    def __init__(self, receive):
+        self._receive = receive
+        self._more_body = True
+
+    async def read(self):
+        while self._more_body:
+            message = await self._receive()
+            if message['type'] == 'http.disconnect':
+                raise ConnectionError('Client disconnected.')
+            self._more_body = message.get('more_body', False)
+            if message.get('body'):
+                return message['body']
+        return b''
+
+
+class AsyncPart:
+
+    def __init__(self, reader, headers, depth):
+        self.headers = headers
+        self.depth = depth
+        self.summary = None
+        self._reader = reader
+        self._done = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        chunk = await self._reader._next_data(self)
+        if chunk is None:
+            raise StopAsyncIteration
+        return chunk
+
+    async def read(self):
+        return b''.join([chunk async for chunk in self])
+
+
+class _AsyncParts:
+    # The underlying source is only read when all the events from the
+    # previous chunk have been consumed, so a slow consumer slows down the
+    # reads instead of piling up chunks in memory.
+
+    def __init__(self, source, content_type, options):
+        self._source = source
+        self._events = deque()
+        self._data = None
+        self._parser = Parser(None, content_type, **options)
+        self._complete = False
+        self._part = None
+        self._depth = -1
+
+    async def _next_event(self):
+        while not self._events:
+            if self._complete:
+                return None
+            data = await self._source.read()
+            if not data:
+                raise ValueError('Unexpected end of multipart body.')
+            self._data = data
+            self._events.extend(self._parser.feed(data))
+        event = self._events.popleft()
+        if event[0] == BODY_BEGIN:
+            self._depth = event[1]
+        elif event[0] == BODY_COMPLETE:
+            # Nested bodies end within the outer one.
+            self._depth = event[1] - 1
+            self._complete = self._depth < 0
+        return event
+
+    async def _next_data(self, part):
+        if part._done:
+            return None
+        kind, a, b = await self._next_event()
+        if kind == PART_DATA:
+            return self._data[a:b]
+        if kind == PART_DATA_BYTES:
+            return a
+        if kind == PART_COMPLETE:
+            part.summary = a
+        # Part complete, or beginning of a nested body: its parts come next.
+        part._done = True
+        return None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        cdef list headers = []
+        if self._part is not None:
+            # Skip what the consumer did not read from the previous part.
+            while await self._next_data(self._part) is not None:
+                pass
+            self._part = None
+        while True:
+            item = await self._next_event()
+            if item is None:
+                raise StopAsyncIteration
+            kind, a, b = item
+            if kind == HEADER:
+                headers.append((a, b))
+            elif kind == HEADERS_COMPLETE:
+                self._part = AsyncPart(self, headers, self._depth)
+                return self._part
+
+
+def iter_parts(source, bytes content_type, *, Py_ssize_t chunk_size=65536,
+               **options):
+    if hasattr(source, 'read'):
+        source = _StreamSource(source, chunk_size)
+    else:
+        source = _ASGISource(source)
+    return _AsyncParts(source, content_type, options)
@@ -0,0 +1,147 @@
+import asyncio
+
+from multifruits import iter_parts
+import pytest
+
+
+BODY = (b'--foo\r\n'
+        b'Content-Disposition: form-data; name=baz; filename="baz.png"\r\n'
+        b'Content-Type: image/png\r\n'
+        b'\r\n'
+        b'abcdef\r\n'
+        b'--foo\r\n'
+        b'Content-Disposition: form-data; name="text1"\r\n'
+        b'\r\n'
+        b'abc\r\n--foo--')
+CONTENT_TYPE = b'multipart/form-data; boundary=foo'
+
+
+async def collect(source, **kwargs):
+    parts = []
+    async for part in iter_parts(source, CONTENT_TYPE, **kwargs):
+        parts.append((part.headers, await part.read()))
+    return parts
+
+
+def test_iter_parts_stream_reader():
+    async def main():
+        reader = asyncio.StreamReader()
+        reader.feed_data(BODY)
+        reader.feed_eof()
+        return await collect(reader, chunk_size=5)
+
+    assert asyncio.run(main()) == [
+        ([(b'Content-Disposition', b'form-data; name=baz; filename="baz.png"'),
+          (b'Content-Type', b'image/png')], b'abcdef'),
+        ([(b'Content-Disposition', b'form-data; name="text1"')], b'abc'),
+    ]
+
+
+def test_iter_parts_asgi_receive():
+    messages = [{'type': 'http.request', 'body': BODY[:20], 'more_body': True},
+                {'type': 'http.request', 'body': b'', 'more_body': True},
+                {'type': 'http.request', 'body': BODY[20:]}]
+
+    async def receive():
+        return messages.pop(0)
+
+    parts = asyncio.run(collect(receive))
+    assert [content for _, content in parts] == [b'abcdef', b'abc']
+
+
+def test_iter_parts_skip_unread_part():
+    async def main():
+        reader = asyncio.StreamReader()
+        reader.feed_data(BODY)
+        reader.feed_eof()
+        headers = []
+        async for part in iter_parts(reader, CONTENT_TYPE, chunk_size=3):
+            headers.append(part.headers)
+        return headers
+
+    headers = asyncio.run(main())
+    assert len(headers) == 2
+
+
+def test_iter_parts_backpressure():
+    reads = []
+
+    class Source:
+        async def read(self, size):
+            reads.append(size)
+            offset = (len(reads) - 1) * size
+            return BODY[offset:offset + size]
+
+    async def main():
+        parts = iter_parts(Source(), CONTENT_TYPE, chunk_size=10)
+        part = await parts.__anext__()
+        assert b'abcdef'.startswith(await part.__anext__())
+        return len(reads)
+
+    # Only what is needed to reach the first data chunk has been read.
+    assert asyncio.run(main()) * 10 <= BODY.index(b'abcdef') + 10
+
+
+def test_iter_parts_truncated():
+    async def main():
+        reader = asyncio.StreamReader()
+        reader.feed_data(BODY[:-10])
+        reader.feed_eof()
+        return await collect(reader)
+
+    with pytest.raises(ValueError):
+        asyncio.run(main())
+
+
+NESTED_BODY = (b'--foo\r\n'
+               b'Content-Disposition: form-data; name="files"\r\n'
+               b'Content-Type: multipart/mixed; boundary=bar\r\n'
+               b'\r\n'
+               b'--bar\r\n'
+               b'Content-Disposition: file; filename="a.txt"\r\n'
+               b'\r\n'
+               b'aaa\r\n'
+               b'--bar--\r\n'
+               b'--foo\r\n'
+               b'Content-Disposition: form-data; name="after"\r\n'
+               b'\r\n'
+               b'abc\r\n--foo--')
+
+
+@pytest.mark.parametrize('chunk_size', [1, 5, 65536])
+def test_iter_parts_nested(chunk_size):
+    async def main():
+        reader = asyncio.StreamReader()
+        reader.feed_data(NESTED_BODY)
+        reader.feed_eof()
+        return [(part.depth, part.headers[0][1], await part.read())
+                async for part in iter_parts(reader, CONTENT_TYPE,
+                                             chunk_size=chunk_size,
+                                             max_depth=1)]
+
+    assert asyncio.run(main()) == [
+        (0, b'form-data; name="files"', b''),
+        (1, b'file; filename="a.txt"', b'aaa'),
+        (0, b'form-data; name="after"', b'abc'),
+    ]
+
+
+def test_iter_parts_digests():
+    import hashlib
+
+    async def main():
+        reader = asyncio.StreamReader()
+        reader.feed_data(BODY)
+        reader.feed_eof()
+        summaries = []
+        async for part in iter_parts(reader, CONTENT_TYPE, chunk_size=5,
+                                     digests=['sha256']):
+            await part.read()
+            summaries.append(part.summary)
+        return summaries
+
+    assert [(summary.size, summary.digests['sha256'])
+            for summary in asyncio.run(main())] == [
+        (6, hashlib.sha256(b'abcdef').hexdigest()),
+        (3, hashlib.sha256(b'abc').hexdigest()),
+    ]
@@ -210,3 +210,88 @@ def test_attwithasciifilenamews1():
         b'attachment; filename ="foo.html"')
     assert dtype == b'attachment'
     assert params == {b'filename': b'foo.html'}
+
+
+def test_disposition_cache():
+    from multifruits import DispositionCache
+    cache = DispositionCache(maxsize=2)
+    header = "form-data; name=baz; filename*=UTF-8''foo-ä.html".encode()
+    dtype, params = cache.parse(header)
+    assert dtype == b'form-data'
+    assert params == {b'name': b'baz',
+                      b'filename*': "UTF-8''foo-ä.html".encode()}
+    assert cache.filename(header) == 'foo-ä.html'
+    assert cache.parse(header)[1] is params
+    assert (cache.hits, cache.misses) == (2, 1)
+    try:
+        params[b'name'] = b'other'
+    except TypeError:
+        pass
+    else:
+        raise AssertionError('Cached params must be read-only.')
+    cache.parse(b'form-data; name=foo')
+    cache.parse(header)
+    cache.parse(b'form-data; name=bar')  # Evicts name=foo.
+    assert len(cache) == 2
+    cache.parse(header)
+    cache.parse(b'form-data; name=foo')
+    assert (cache.hits, cache.misses) == (4, 4)
+    cache.clear()
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (0, 0)
+
+
+def test_attwithequalinquotes():
+    dtype, params = parse_content_disposition(
+        b'attachment; filename="a=b.html"')
+    assert dtype == b'attachment'
+    assert params == {b'filename': b'a=b.html'}
+
+
+def test_attucasewithparams():
+    dtype, params = parse_content_disposition(
+        b'ATTACHMENT; filename=foo.html')
+    assert dtype == b'attachment'
+    assert params == {b'filename': b'foo.html'}
+
+
+def test_attfncont():
+    dtype, params = parse_content_disposition(
+        b'attachment; filename*0="foo."; filename*1="html"')
+    assert dtype == b'attachment'
+    assert params == {b'filename': b'foo.html'}
+
+
+def test_attfncontenc():
+    dtype, params = parse_content_disposition(
+        b'attachment; filename*0*=UTF-8\'\'foo-%c3%a4; filename*1=".html"')
+    assert dtype == b'attachment'
+    assert params == {b'filename*': b"UTF-8''foo-%c3%a4.html"}
+
+
+def test_attfncontlz():
+    dtype, params = parse_content_disposition(
+        b'attachment; filename*0="foo"; filename*01="bar"')
+    assert dtype == b'attachment'
+    assert params == {b'filename': b'foo'}
+
+
+def test_attfncontnc():
+    dtype, params = parse_content_disposition(
+        b'attachment; filename*0="foo"; filename*2="bar"')
+    assert dtype == b'attachment'
+    assert params == {b'filename': b'foo'}
+
+
+def test_attfnconts1():
+    dtype, params = parse_content_disposition(
+        b'attachment; filename*1="foo."; filename*2="html"')
+    assert dtype == b'attachment'
+    assert params == {}
+
+
+def test_attfncontord():
+    dtype, params = parse_content_disposition(
+        b'attachment; filename*1="bar"; filename*0="foo"')
+    assert dtype == b'attachment'
+    assert params == {b'filename': b'foobar'}
@@ -67,3 +67,9 @@ def test_extract_filename_star_without_quotes_but_filename():
         b'filename*': "foo-ä-€.html".encode(),
         b'filename': b"baz.quux"
     }) == "baz.quux"
+
+
+def test_extract_filename_star_percent_encoded():
+    assert extract_filename({
+        b'filename*': b"UTF-8''foo-%c3%a4-%e2%82%ac.html"
+    }) == 'foo-ä-€.html'
@@ -0,0 +1,157 @@
+from multifruits import FieldTooLarge, FormParser, parse_form
+import pytest
+
+
+BODY = (b'--foo\r\n'
+        b'Content-Disposition: form-data; name=baz; filename="baz.png"\r\n'
+        b'Content-Type: image/png\r\n'
+        b'\r\n'
+        b'abcdef\r\n'
+        b'--foo\r\n'
+        b'content-disposition: form-data; name="text1"\r\n'
+        b'\r\n'
+        b'abc\r\n--foo--')
+CONTENT_TYPE = b'multipart/form-data; boundary=foo'
+
+
+def test_parse_form():
+    fields, files = parse_form(BODY, CONTENT_TYPE)
+    assert len(fields) == 1
+    assert fields[0].name == b'text1'
+    assert fields[0].value == b'abc'
+    assert fields[0].filename is None
+    assert fields[0].file is None
+    assert len(files) == 1
+    assert files[0].name == b'baz'
+    assert files[0].filename == 'baz.png'
+    assert files[0].content_type == b'image/png'
+    assert files[0].value is None
+    assert files[0].file.read() == b'abcdef'
+    assert files[0].headers == {
+        b'Content-Disposition': b'form-data; name=baz; filename="baz.png"',
+        b'Content-Type': b'image/png'
+    }
+
+
+def test_form_parser_chunked():
+    form = FormParser(CONTENT_TYPE)
+    for idx in range(len(BODY)):
+        form.feed_data(BODY[idx:idx+1])
+    assert form.fields[0].value == b'abc'
+    assert form.files[0].file.read() == b'abcdef'
+    form.close()
+    assert form.files[0].file.closed
+
+
+@pytest.mark.parametrize('size, rolled', [(10, False), (4, True)])
+def test_form_parser_rollover(size, rolled):
+    fields, files = parse_form(BODY, CONTENT_TYPE, max_memory_size=size)
+    assert files[0].file._rolled == rolled
+    assert files[0].file.read() == b'abcdef'
+    assert fields[0].value == b'abc'
+
+
+def test_form_parser_filename_star():
+    body = (b'--foo\r\n'
+            b'Content-Disposition: form-data; name=baz; '
+            b'filename*="utf-8\'\'baz-\xc3\xa9.png"\r\n'
+            b'\r\n'
+            b'\r\n--foo--')
+    fields, files = parse_form(body, CONTENT_TYPE)
+    assert fields == []
+    assert files[0].filename == 'baz-é.png'
+    assert files[0].file.read() == b''
+
+
+def test_form_parser_disposition_cache():
+    from multifruits import DispositionCache
+    cache = DispositionCache()
+    for _ in range(3):
+        fields, files = parse_form(BODY, CONTENT_TYPE,
+                                   disposition_cache=cache)
+        assert fields[0].name == b'text1'
+        assert files[0].filename == 'baz.png'
+    assert cache.misses == 3
+    assert cache.hits == 6
+
+
+def test_parse_form_truncated(monkeypatch):
+    import tempfile
+    import multifruits
+    from multifruits import MultipartWriter
+    spooled = []
+
+    class RecordingFile(tempfile.SpooledTemporaryFile):
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            spooled.append(self)
+
+    monkeypatch.setattr(multifruits, 'SpooledTemporaryFile', RecordingFile)
+    writer = MultipartWriter(b'foo')
+    writer.add_field('text', 'abc')
+    writer.add_file('upload', b'x' * 100, 'a.bin')
+    body = b''.join(writer)
+    with pytest.raises(ValueError):
+        parse_form(body[:-20], writer.content_type)
+    assert len(spooled) == 1
+    assert spooled[0].closed
+    form = FormParser(writer.content_type)
+    form.feed_data(body[:-20])
+    with pytest.raises(ValueError):
+        form.feed_eof()
+    assert [part.name for part in form.fields] == [b'text']
+    assert form.files == []
+    form.close()
+    assert spooled[1].closed
+
+
+def test_form_parser_digests():
+    form = FormParser(CONTENT_TYPE, digests=['md5'])
+    form.feed_data(BODY)
+    form.feed_eof()
+    assert form.fields[0].value == b'abc'
+    assert form.files[0].file.read() == b'abcdef'
+    form.close()
+
+
+def test_form_parser_nested_and_misuse():
+    body = (b'--foo\r\n'
+            b'Content-Disposition: form-data; name="files"\r\n'
+            b'Content-Type: multipart/mixed; boundary=bar\r\n'
+            b'\r\n'
+            b'--bar\r\n'
+            b'Content-Disposition: file; filename="a.txt"\r\n'
+            b'\r\n'
+            b'abc\r\n--bar--\r\n--foo--')
+    with pytest.raises(ValueError):
+        parse_form(body, CONTENT_TYPE, max_depth=1)
+    fields, files = parse_form(body, CONTENT_TYPE, max_depth=0)
+    assert fields[0].value.startswith(b'--bar')
+    form = FormParser(CONTENT_TYPE)
+    with pytest.raises(RuntimeError):
+        form.on_data(b'x')
+    with pytest.raises(RuntimeError):
+        form.on_part_complete()
+    with pytest.raises(RuntimeError):
+        form.on_part_info(b'a', None, None)
+    form.on_part_begin()
+    with pytest.raises(RuntimeError):
+        form.on_data(b'x')
+
+
+def test_form_parser_max_field_size():
+    body = (b'--foo\r\n'
+            b'content-disposition: form-data; name="text1"\r\n'
+            b'\r\n' + b'x' * 2048 + b'\r\n--foo--')
+    with pytest.raises(FieldTooLarge):
+        parse_form(body, CONTENT_TYPE, max_field_size=1024)
+    form = FormParser(CONTENT_TYPE, max_field_size=1024)
+    with pytest.raises(FieldTooLarge):
+        for idx in range(0, len(body), 100):
+            form.feed_data(body[idx:idx+100])
+    fields, files = parse_form(body, CONTENT_TYPE, max_field_size=0)
+    assert len(fields[0].value) == 2048
+    # Files are not fields.
+    fields, files = parse_form(BODY, CONTENT_TYPE, max_field_size=3)
+    assert files[0].file.read() == b'abcdef'
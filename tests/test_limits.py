@@ -0,0 +1,67 @@
+from multifruits import (BodyTooLarge, HeaderTooLarge, LimitExceeded, Parser,
+                         PartTooLarge, TooManyHeaders, TooManyParts)
+import pytest
+
+
+BODY = (b'--foo\r\n'
+        b'Content-Disposition: form-data; name=baz; filename="baz.png"\r\n'
+        b'Content-Type: image/png\r\n'
+        b'\r\n'
+        b'abcdef\r\n'
+        b'--foo\r\n'
+        b'Content-Disposition: form-data; name="text1"\r\n'
+        b'\r\n'
+        b'abc\r\n--foo--')
+CONTENT_TYPE = b'multipart/form-data; boundary=foo'
+
+
+class Handler:
+
+    def __init__(self):
+        self.parts = 0
+
+    def on_part_complete(self):
+        self.parts += 1
+
+
+@pytest.mark.parametrize('limit, value, exception', [
+    ('max_body_size', len(BODY) - 1, BodyTooLarge),
+    ('max_parts', 1, TooManyParts),
+    ('max_part_size', 5, PartTooLarge),
+    ('max_headers', 1, TooManyHeaders),
+    ('max_header_size', 40, HeaderTooLarge),
+])
+def test_limit_exceeded(limit, value, exception):
+    parser = Parser(Handler(), CONTENT_TYPE, **{limit: value})
+    with pytest.raises(exception):
+        for idx in range(0, len(BODY), 7):
+            parser.feed(BODY[idx:idx+7])
+    assert issubclass(exception, LimitExceeded)
+    assert issubclass(exception, ValueError)
+
+
+@pytest.mark.parametrize('limit, value', [
+    ('max_body_size', len(BODY)),
+    ('max_parts', 2),
+    ('max_part_size', 6),
+    ('max_headers', 2),
+    ('max_header_size', 59),
+])
+def test_limit_not_exceeded(limit, value):
+    handler = Handler()
+    parser = Parser(handler, CONTENT_TYPE, **{limit: value})
+    for idx in range(len(BODY)):
+        parser.feed_data(BODY[idx:idx+1])
+    assert handler.parts == 2
+
+
+def test_part_size_limit_with_sink(tmp_path):
+    class SinkHandler:
+        def on_headers_complete(self):
+            return self.file
+
+    handler = SinkHandler()
+    with (tmp_path / 'part').open('wb') as handler.file:
+        parser = Parser(handler, CONTENT_TYPE, max_part_size=5)
+        with pytest.raises(PartTooLarge):
+            parser.feed_data(BODY)
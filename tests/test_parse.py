@@ -1,6 +1,7 @@
+import base64
 from collections import namedtuple
 
-from multifruits import Parser
+from multifruits import Event, NestingTooDeep, Parser
 import pytest
 
 
@@ -377,3 +378,748 @@ def test_parse_with_null_byte():
     assert form.parts
     assert form.parts[0].content == b'abcdef\x00ghi'
     assert form.parts[1].content == b'abc\x00def'
+
+
+def test_parse_delimiter_like_data_at_every_split():
+    content = b'\r\r\n\r\n-\r\n--\r\n--f\r\n--fo\r\n-foo\n--foo\r--foo'
+    body = (b'--foo\r\n'
+            b'Content-Disposition: form-data; name="text1"\r\n'
+            b'\r\n' + content + b'\r\n'
+            b'--foo\r\n'
+            b'Content-Disposition: form-data; name="text2"\r\n'
+            b'\r\n'
+            b'\r\n\r\n--foo--')
+    for idx in range(len(body)):
+        form = Handler(b'multipart/form-data; boundary=foo')
+        form.feed_data(body[:idx])
+        form.feed_data(body[idx:])
+        assert form.parts[0].content == content
+        assert form.parts[1].content == b'\r\n'
+        assert form.on_body_complete_called == 1
+
+
+def test_parse_large_binary_content():
+    content = bytes(range(256)) * 4096 + b'\r\n--fo' + b'\r' * 1000
+    body = (b'--foo\r\n'
+            b'Content-Disposition: form-data; name=baz; filename="baz.bin"\r\n'
+            b'\r\n' + content + b'\r\n--foo--')
+    form = Handler(b'multipart/form-data; boundary=foo')
+    for idx in range(0, len(body), 65536):
+        form.feed_data(body[idx:idx+65536])
+    assert form.parts[0].content == content
+
+
+@pytest.mark.parametrize('wrap', [bytearray, memoryview])
+def test_parse_buffer_input(wrap):
+    body = (b'--foo\r\n'
+            b'Content-Disposition: form-data; name="text1"\r\n'
+            b'\r\n'
+            b'abc\r\n--foo--')
+    form = Handler(b'multipart/form-data; boundary=foo')
+    form.feed_data(wrap(body[:30]))
+    form.feed_data(wrap(body[30:]))
+    assert form.parts[0].headers == {
+        b'Content-Disposition': b'form-data; name="text1"'
+    }
+    assert form.parts[0].content == b'abc'
+
+
+def test_parse_zero_copy():
+    body = bytearray(b'--foo\r\n'
+                     b'Content-Disposition: form-data; name="text1"\r\n'
+                     b'\r\n'
+                     b'abcdef\r\n--foo--')
+
+    class ZeroCopyHandler(Handler):
+        def __init__(self, boundary):
+            super().__init__(boundary)
+            self.parser = Parser(self, boundary, zero_copy=True)
+
+        def on_data(self, data):
+            assert isinstance(data, memoryview)
+            self._current.content += bytes(data)
+
+    form = ZeroCopyHandler(b'multipart/form-data; boundary=foo')
+    form.feed_data(body)
+    assert form.parts[0].content == b'abcdef'
+    body.extend(b'epilogue')  # Buffer has been released.
+
+
+class ChunksHandler(Handler):
+
+    def __init__(self, boundary, **kwargs):
+        super().__init__(boundary)
+        self.parser = Parser(self, boundary, **kwargs)
+        self.chunks = []
+
+    def on_data(self, data):
+        self.chunks.append(bytes(data))
+        self._current.content += data
+
+
+def test_parse_min_data_size():
+    content = b'a\rb\r\nc\r\n-d\r\n--fe' * 20
+    body = (b'--foo\r\n'
+            b'Content-Disposition: form-data; name="text1"\r\n'
+            b'\r\n' + content + b'\r\n--foo--')
+    form = ChunksHandler(b'multipart/form-data; boundary=foo',
+                         min_data_size=64)
+    for idx in range(len(body)):
+        form.feed_data(body[idx:idx+1])
+    assert form.parts[0].content == content
+    assert all(len(chunk) == 64 for chunk in form.chunks[:-1])
+    assert 0 < len(form.chunks[-1]) <= 64
+
+
+def test_parse_max_data_size():
+    content = b'abcdef\r\n' * 100
+    body = (b'--foo\r\n'
+            b'Content-Disposition: form-data; name="text1"\r\n'
+            b'\r\n' + content + b'\r\n--foo--')
+    form = ChunksHandler(b'multipart/form-data; boundary=foo',
+                         min_data_size=10, max_data_size=100, zero_copy=True)
+    form.feed_data(body[:50])
+    form.feed_data(body[50:])
+    assert form.parts[0].content == content
+    assert all(10 <= len(chunk) <= 100 for chunk in form.chunks)
+
+
+def test_parse_invalid_data_sizes():
+    with pytest.raises(ValueError):
+        Parser(None, b'multipart/form-data; boundary=foo',
+               min_data_size=10, max_data_size=5)
+
+
+class SinkHandler(Handler):
+
+    def __init__(self, boundary, sinks, **kwargs):
+        super().__init__(boundary)
+        self.parser = Parser(self, boundary, **kwargs)
+        self.sinks = iter(sinks)
+        self.summaries = []
+
+    def on_headers_complete(self):
+        super().on_headers_complete()
+        return next(self.sinks)
+
+    def on_part_complete(self, summary=None):
+        self.summaries.append(summary)
+        super().on_part_complete()
+
+
+@pytest.mark.parametrize('min_data_size', [0, 4])
+def test_parse_sink(tmp_path, min_data_size):
+    body = (b'--foo\r\n'
+            b'Content-Disposition: form-data; name=baz; filename="baz.png"\r\n'
+            b'\r\n'
+            b'abc\r\ndef\r\n'
+            b'--foo\r\n'
+            b'Content-Disposition: form-data; name="text1"\r\n'
+            b'\r\n'
+            b'abc\r\n--foo--')
+    with (tmp_path / 'baz.png').open('wb') as f:
+        form = SinkHandler(b'multipart/form-data; boundary=foo', [f, None],
+                           min_data_size=min_data_size)
+        for idx in range(len(body)):
+            form.feed_data(body[idx:idx+1])
+    assert (tmp_path / 'baz.png').read_bytes() == b'abc\r\ndef'
+    assert form.parts[0].content == b''
+    assert form.summaries[0].size == 8
+    assert form.summaries[0].error is None
+    assert form.parts[1].content == b'abc'
+    assert form.summaries[1] is None
+
+
+def test_parse_sink_fd_error(tmp_path):
+    body = (b'--foo\r\n'
+            b'Content-Disposition: form-data; name=baz; filename="baz.png"\r\n'
+            b'\r\n'
+            b'abcdef\r\n--foo--')
+    with (tmp_path / 'baz.png').open('wb') as f:
+        f.write(b'x')
+    with (tmp_path / 'baz.png').open('rb') as f:
+        form = SinkHandler(b'multipart/form-data; boundary=foo',
+                           [f.fileno()])
+        form.feed_data(body)
+    assert form.summaries[0].size == 0
+    assert isinstance(form.summaries[0].error, OSError)
+    assert form.on_body_complete_called == 1
+
+
+def test_parse_feed_events():
+    from multifruits import Event
+    body = (b'--foo\r\n'
+            b'Content-Disposition: form-data; name="text1"\r\n'
+            b'\r\n'
+            b'abc\r\n--f')
+    parser = Parser(None, b'multipart/form-data; boundary=foo')
+    events = parser.feed(body)
+    assert events == [
+        (Event.BODY_BEGIN, 0, None),
+        (Event.PART_BEGIN, None, None),
+        (Event.HEADER, b'Content-Disposition', b'form-data; name="text1"'),
+        (Event.HEADERS_COMPLETE, None, None),
+        (Event.PART_DATA, 55, 58),
+    ]
+    assert body[55:58] == b'abc'
+    assert parser.feed(b'x\r\n--foo--') == [
+        (Event.PART_DATA_BYTES, b'\r\n--f', None),
+        (Event.PART_DATA, 0, 1),
+        (Event.PART_COMPLETE, None, None),
+        (Event.BODY_COMPLETE, 0, None),
+    ]
+
+
+def test_parse_empty_header_value():
+    body = (b'--foo\r\n'
+            b'X-Empty:\r\n'
+            b'Content-Disposition: form-data; name="text1"\r\n'
+            b'\r\n'
+            b'abc\r\n--foo--')
+    form = Handler(b'multipart/form-data; boundary=foo')
+    for idx in range(len(body)):
+        form.feed_data(body[idx:idx+1])
+    assert form.parts[0].headers == {
+        b'X-Empty': b'',
+        b'Content-Disposition': b'form-data; name="text1"'
+    }
+
+
+def test_parse_empty_header_name():
+    body = (b'--foo\r\n'
+            b': form-data; name="text1"\r\n'
+            b'\r\n'
+            b'abc\r\n--foo--')
+    form = Handler(b'multipart/form-data; boundary=foo')
+    with pytest.raises(ValueError):
+        form.feed_data(body)
+
+
+def test_parse_long_header_char_by_char():
+    value = b'form-data; name="text1"; filename="' + b'a' * 10000 + b'"'
+    body = (b'--foo\r\n'
+            b'Content-Disposition: ' + value + b'\r\n'
+            b'\r\n'
+            b'abc\r\n--foo--')
+    form = Handler(b'multipart/form-data; boundary=foo')
+    for idx in range(len(body)):
+        form.feed_data(body[idx:idx+1])
+    assert form.parts[0].headers == {b'Content-Disposition': value}
+
+
+@pytest.mark.parametrize('options, expected', [
+    ({'canonical_headers': True},
+     [b'Content-Disposition', b'Content-Type', b'X-Foo']),
+    ({'lower_headers': True},
+     [b'content-disposition', b'content-type', b'x-foo']),
+    ({'canonical_headers': True, 'lower_headers': True},
+     [b'content-disposition', b'content-type', b'x-foo']),
+])
+def test_parse_canonical_headers(options, expected):
+    from multifruits import Event
+    body = (b'--foo\r\n'
+            b'content-disposition: form-data; name="text1"\r\n'
+            b'CONTENT-TYPE: text/plain\r\n'
+            b'X-Foo: bar\r\n'
+            b'\r\n'
+            b'abc\r\n--foo--')
+    parser = Parser(None, b'multipart/form-data; boundary=foo', **options)
+    names = [a for kind, a, b in parser.feed(body) if kind == Event.HEADER]
+    assert names == expected
+    if options.get('canonical_headers'):
+        other = Parser(None, b'multipart/form-data; boundary=foo', **options)
+        other_names = [a for kind, a, b in other.feed(body) if kind == Event.HEADER]
+        assert names[0] is other_names[0]
+        assert names[1] is other_names[1]
+
+
+def test_parse_reset():
+    body = (b'--foo\r\n'
+            b'Content-Disposition: form-data; name="text1"\r\n'
+            b'\r\n'
+            b'abc\r\n--foo--')
+    form = Handler(b'multipart/form-data; boundary=foo')
+    form.feed_data(body[:-10])
+    other = Handler(b'multipart/form-data; boundary=bar')
+    form.parser.reset(other, b'multipart/form-data; boundary=bar')
+    form.parser.feed_data(body.replace(b'foo', b'bar'))
+    assert form.parts == []
+    assert other.parts[0].content == b'abc'
+    form.parser.reset()
+    form.parser.feed_data(body.replace(b'foo', b'bar'))
+    assert other.parts[1].content == b'abc'
+
+
+def test_parser_pool():
+    from multifruits import ParserPool
+    body = (b'--foo\r\n'
+            b'Content-Disposition: form-data; name="text1"\r\n'
+            b'\r\n'
+            b'abc\r\n--foo--')
+    pool = ParserPool(maxsize=1, max_parts=1)
+    form = Handler(b'multipart/form-data; boundary=foo')
+    parser = pool.acquire(form, b'multipart/form-data; boundary=foo')
+    parser.feed_data(body)
+    pool.release(parser)
+    other = Handler(b'multipart/form-data; boundary=bar')
+    assert pool.acquire(other, b'multipart/form-data; boundary=bar') is parser
+    parser.feed_data(body.replace(b'foo', b'bar'))
+    assert len(form.parts) == 1
+    assert len(other.parts) == 1
+    pool.release(parser)
+    new = pool.acquire(other, b'multipart/form-data; boundary=bar')
+    assert pool.acquire(other, b'multipart/form-data; boundary=bar') is not new
+
+
+def test_parser_pool_release_invalid():
+    from multifruits import ParserPool
+    pool = ParserPool()
+    with pytest.raises(TypeError):
+        pool.release(None)
+
+    class Releasing(Handler):
+        def on_part_begin(self):
+            pool.release(self.parser)
+
+    form = Releasing(b'multipart/form-data; boundary=foo')
+    with pytest.raises(RuntimeError):
+        form.feed_data(b'--foo\r\n\r\nabc\r\n--foo--')
+    assert pool.acquire(form, b'multipart/form-data; boundary=foo') \
+        is not form.parser
+
+
+@pytest.mark.parametrize('name', [b'Content\tType', 'Contént'.encode(),
+                                  b'Content Type', b'Content/Type'])
+def test_parse_header_name_not_a_token(name):
+    body = (b'--foo\r\n' + name + b': text/plain\r\n'
+            b'\r\n'
+            b'abc\r\n--foo--')
+    form = Handler(b'multipart/form-data; boundary=foo')
+    with pytest.raises(ValueError):
+        form.feed_data(body)
+
+
+def test_parse_stats():
+    body = (b'--foo\r\n'
+            b'Content-Disposition: form-data; name="text1"\r\n'
+            b'\r\n'
+            b'a\r\nb\r\n-c\r\n--fo\r\n--foo\r\n'
+            b'Content-Disposition: form-data; name="text2"\r\n'
+            b'\r\n'
+            b'abc\r\n--foo--')
+    form = Handler(b'multipart/form-data; boundary=foo')
+    form.feed_data(body[:5])
+    form.feed_data(body[5:])
+    stats = form.parser.stats
+    assert stats['bytes_fed'] == len(body)
+    assert stats['feed_calls'] == 2
+    assert stats['parts'] == 2
+    # Skipped by the delimiter search without comparing.
+    assert stats['false_starts'] == 0
+    assert stats['max_header_size'] == len(b'Content-Disposition'
+                                           b'form-data; name="text1"')
+    assert stats['callbacks'] == {
+        'on_body_begin': 1, 'on_part_begin': 2, 'on_header': 2,
+        'on_headers_complete': 2, 'on_data': 2, 'on_part_complete': 2,
+        'on_body_complete': 1, 'on_headers': 0, 'on_part_info': 0}
+    assert 'state_ns' not in stats
+
+
+def test_parse_stats_headers_and_part_info():
+    body = (b'--foo\r\n'
+            b'Content-Disposition: form-data; name="text1"\r\n'
+            b'\r\n'
+            b'abc\r\n--foo--')
+
+    class InfoHandler:
+        def on_headers(self, headers):
+            pass
+
+        def on_part_info(self, name, filename, content_type):
+            pass
+
+    parser = Parser(InfoHandler(), b'multipart/form-data; boundary=foo')
+    parser.feed_data(body)
+    callbacks = parser.stats['callbacks']
+    assert callbacks['on_headers'] == 1
+    assert callbacks['on_part_info'] == 1
+    parser = Parser(None, b'multipart/form-data; boundary=foo')
+    parser.feed(body)
+    callbacks = parser.stats['callbacks']
+    assert callbacks['on_headers'] == callbacks['on_part_info'] == 0
+
+
+def test_parse_stats_false_starts():
+    body = (b'--foo\r\n'
+            b'\r\n' + b'a\r\n--goo\r\n--fo\r\nxxxxxxx--foo' * 3 +
+            b'\r\n--foo--')
+    parser = Parser(None, b'multipart/form-data; boundary=foo')
+    parser.feed(body)
+    # Windows ending like the delimiter, in a single chunk.
+    assert parser.stats['false_starts'] == 7
+
+
+def test_parse_stats_profile():
+    body = (b'--foo\r\n'
+            b'Content-Disposition: form-data; name="text1"\r\n'
+            b'\r\n'
+            b'a\r\nb\r\n-c\r\n--fo\r\n--foo--')
+    parser = Parser(None, b'multipart/form-data; boundary=foo', profile=True)
+    for idx in range(len(body)):
+        parser.feed_data(body[idx:idx+1])
+    stats = parser.stats
+    assert stats['false_starts'] == 3
+    assert stats['callbacks']['on_data'] == 0
+    assert stats['state_ns']['HEADER_NAME'] > 0
+    assert stats['state_ns']['DATA_BOUNDARY'] > 0
+
+
+def test_parse_reentrant_feed():
+    body = (b'--foo\r\n'
+            b'Content-Disposition: form-data; name="text1"\r\n'
+            b'\r\n'
+            b'abc\r\n--foo--')
+
+    class ReentrantHandler(Handler):
+        def on_part_begin(self):
+            self.parser.feed_data(b'')
+
+    form = ReentrantHandler(b'multipart/form-data; boundary=foo')
+    with pytest.raises(RuntimeError):
+        form.feed_data(body)
+
+
+def test_parse_threads():
+    import threading
+    content = bytes(range(256)) * 4096 + b'\r\n--fo'
+    body = (b'--foo\r\n'
+            b'Content-Disposition: form-data; name=baz; filename="baz.bin"\r\n'
+            b'\r\n' + content + b'\r\n--foo--')
+    forms = [Handler(b'multipart/form-data; boundary=foo') for _ in range(4)]
+
+    def parse(form):
+        for idx in range(0, len(body), 300000):
+            form.feed_data(body[idx:idx+300000])
+
+    threads = [threading.Thread(target=parse, args=(form,)) for form in forms]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(form.parts[0].content == content for form in forms)
+
+
+TRANSFER_ENCODED_BODY = (
+    b'--foo\r\n'
+    b'Content-Disposition: form-data; name=baz; filename="baz.bin"\r\n'
+    b'Content-Transfer-Encoding: base64\r\n'
+    b'\r\n' + base64.encodebytes(bytes(range(256)) * 3).replace(b'\n', b'\r\n')
+    + b'\r\n--foo\r\n'
+    b'Content-Disposition: form-data; name="text1"\r\n'
+    b'content-transfer-encoding:  Quoted-Printable \r\n'
+    b'\r\n'
+    b'caf=C3=A9 =3D =\r\nsoft, =ZZ, =3\r\n'
+    b'--foo\r\n'
+    b'Content-Disposition: form-data; name="text2"\r\n'
+    b'Content-Transfer-Encoding: 8bit\r\n'
+    b'\r\n'
+    b'a=3Db\r\n--foo--')
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 7, len(TRANSFER_ENCODED_BODY)])
+@pytest.mark.parametrize('min_data_size', [0, 5])
+def test_parse_decode_transfer_encoding(chunk_size, min_data_size):
+    form = ChunksHandler(b'multipart/form-data; boundary=foo',
+                         decode_transfer_encoding=True,
+                         min_data_size=min_data_size)
+    for idx in range(0, len(TRANSFER_ENCODED_BODY), chunk_size):
+        form.feed_data(TRANSFER_ENCODED_BODY[idx:idx+chunk_size])
+    assert form.parts[0].content == bytes(range(256)) * 3
+    assert form.parts[1].content == 'café = soft, =ZZ, =3'.encode()
+    assert form.parts[2].content == b'a=3Db'
+
+
+def test_parse_transfer_encoding_not_decoded_by_default():
+    form = Handler(b'multipart/form-data; boundary=foo')
+    form.feed_data(TRANSFER_ENCODED_BODY)
+    assert form.parts[1].content == b'caf=C3=A9 =3D =\r\nsoft, =ZZ, =3'
+
+
+def test_parse_decode_base64_padding():
+    body = (b'--foo\r\n'
+            b'Content-Transfer-Encoding: base64\r\n'
+            b'\r\n'
+            b'YQ==YWI=\r\nYWJj\r\n'
+            b'--foo\r\n'
+            b'Content-Transfer-Encoding: base64\r\n'
+            b'\r\n'
+            b'YWI\r\n--foo--')
+    form = Handler(b'multipart/form-data; boundary=foo')
+    form.parser = Parser(form, b'multipart/form-data; boundary=foo',
+                         decode_transfer_encoding=True)
+    form.feed_data(body)
+    assert form.parts[0].content == b'aababc'
+    assert form.parts[1].content == b'ab'  # Missing padding.
+
+
+def test_parse_decode_transfer_encoding_sink(tmp_path):
+    with (tmp_path / 'baz.bin').open('wb') as f:
+        form = SinkHandler(b'multipart/form-data; boundary=foo',
+                           [f, None, None], decode_transfer_encoding=True)
+        form.feed_data(TRANSFER_ENCODED_BODY)
+    assert (tmp_path / 'baz.bin').read_bytes() == bytes(range(256)) * 3
+    assert form.summaries[0].size == 768
+
+
+def test_parse_decode_transfer_encoding_large():
+    content = bytes(range(256)) * 1024
+    body = (b'--foo\r\n'
+            b'Content-Transfer-Encoding: base64\r\n'
+            b'\r\n' + base64.b64encode(content) + b'\r\n--foo--')
+    form = ChunksHandler(b'multipart/form-data; boundary=foo',
+                         decode_transfer_encoding=True)
+    form.feed_data(body)
+    assert form.parts[0].content == content
+
+
+NESTED_BODY = (
+    b'--foo\r\n'
+    b'Content-Disposition: form-data; name="text1"\r\n'
+    b'\r\n'
+    b'abc\r\n'
+    b'--foo\r\n'
+    b'Content-Disposition: form-data; name="files"\r\n'
+    b'Content-Type: multipart/mixed; boundary=bar\r\n'
+    b'\r\n'
+    b'--bar\r\n'
+    b'Content-Disposition: file; filename="a.txt"\r\n'
+    b'\r\n'
+    b'aaa\r\n--ba\r\n'
+    b'--bar\r\n'
+    b'Content-Disposition: file; filename="b.txt"\r\n'
+    b'\r\n'
+    b'bbb\r\n'
+    b'--bar--\r\n'
+    b'--foo--')
+
+
+class NestedHandler:
+
+    def __init__(self, **kwargs):
+        self.parser = Parser(self, b'multipart/form-data; boundary=foo',
+                             **kwargs)
+        self.events = []
+
+    def on_body_begin(self):
+        self.events.append(('body', self.parser.depth))
+
+    def on_headers_complete(self):
+        self.events.append(('headers', self.parser.part_path))
+
+    def on_data(self, data):
+        if self.events[-1][0] == 'data':
+            data = self.events.pop()[1] + data
+        self.events.append(('data', bytes(data)))
+
+    def on_part_complete(self):
+        self.events.append(('part', self.parser.part_path))
+
+    def on_body_complete(self):
+        self.events.append(('end', self.parser.depth))
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, len(NESTED_BODY)])
+def test_parse_nested(chunk_size):
+    form = NestedHandler(max_depth=1, zero_copy=True)
+    for idx in range(0, len(NESTED_BODY), chunk_size):
+        form.parser.feed_data(NESTED_BODY[idx:idx+chunk_size])
+    assert form.events == [
+        ('body', 0),
+        ('headers', (0,)), ('data', b'abc'), ('part', (0,)),
+        ('headers', (1,)),
+        ('body', 1),
+        ('headers', (1, 0)), ('data', b'aaa\r\n--ba'), ('part', (1, 0)),
+        ('headers', (1, 1)), ('data', b'bbb'), ('part', (1, 1)),
+        ('end', 1),
+        ('part', (1,)),
+        ('end', 0),
+    ]
+
+
+def test_parse_nested_disabled():
+    form = NestedHandler()
+    form.parser.feed_data(NESTED_BODY)
+    assert form.events[5][1].startswith(b'--bar\r\n')
+    assert form.events[5][1].endswith(b'bbb\r\n--bar--')
+
+
+def test_parse_nested_events():
+    parser = Parser(None, b'multipart/form-data; boundary=foo', max_depth=1)
+    events = parser.feed(NESTED_BODY)
+    data = [NESTED_BODY[a:b] for kind, a, b in events
+            if kind == Event.PART_DATA]
+    assert data == [b'abc', b'aaa\r\n--ba', b'bbb']
+    assert [(kind, a) for kind, a, _ in events
+            if kind in (Event.BODY_BEGIN, Event.BODY_COMPLETE)] == [
+        (Event.BODY_BEGIN, 0), (Event.BODY_BEGIN, 1),
+        (Event.BODY_COMPLETE, 1), (Event.BODY_COMPLETE, 0)]
+
+
+def test_parse_nested_too_deep():
+    body = NESTED_BODY.replace(b'filename="b.txt"\r\n',
+                               b'filename="b.txt"\r\n'
+                               b'Content-Type: multipart/mixed; boundary=baz\r\n')
+    form = NestedHandler(max_depth=1)
+    with pytest.raises(NestingTooDeep):
+        form.parser.feed_data(body)
+
+
+def test_parse_nested_truncated():
+    body = NESTED_BODY.replace(b'--bar--\r\n', b'')
+    form = NestedHandler(max_depth=2)
+    with pytest.raises(ValueError):
+        form.parser.feed_data(body)
+
+
+class PartInfoHandler(Handler):
+
+    def __init__(self, boundary, **kwargs):
+        super().__init__(boundary)
+        self.parser = Parser(self, boundary, **kwargs)
+        self.infos = []
+
+    def on_part_info(self, name, filename, content_type):
+        self.infos.append((name, filename, content_type))
+
+
+@pytest.mark.parametrize('options', [{}, {'disposition_cache': True}])
+def test_parse_part_info(options):
+    from multifruits import DispositionCache
+    if options:
+        options['disposition_cache'] = DispositionCache()
+    body = (b'--foo\r\n'
+            b'Content-Disposition: form-data; name=baz; filename="baz.png"\r\n'
+            b'content-type: image/png\r\n'
+            b'\r\n'
+            b'abc\r\n'
+            b'--foo\r\n'
+            b'Content-Disposition: form-data; name="text1"\r\n'
+            b'\r\n'
+            b'abc\r\n'
+            b'--foo\r\n'
+            b'Content-Disposition: form-data; name="file";'
+            b" filename=\"a.txt\"; filename*=UTF-8''%C3%A9t%C3%A9.txt\r\n"
+            b'\r\n'
+            b'abc\r\n'
+            b'--foo\r\n'
+            b'\r\n'
+            b'abc\r\n--foo--')
+    form = PartInfoHandler(b'multipart/form-data; boundary=foo', **options)
+    for _ in range(2):
+        for idx in range(len(body)):
+            form.feed_data(body[idx:idx+1])
+        form.parser.reset()
+    assert form.infos == [
+        (b'baz', 'baz.png', b'image/png'),
+        (b'text1', None, None),
+        (b'file', 'été.txt', None),
+        (None, None, None),
+    ] * 2
+    assert len(form.parts) == 8
+
+
+class HeadersHandler(Handler):
+
+    def __init__(self, boundary):
+        super().__init__(boundary)
+        self.blocks = []
+
+    def on_headers(self, headers):
+        self.blocks.append(headers)
+
+
+def test_parse_on_headers():
+    body = (b'--foo\r\n'
+            b'Content-Disposition: form-data; name=baz; filename="baz.png"\r\n'
+            b'Content-Type: image/png\r\n'
+            b'\r\n'
+            b'abc\r\n'
+            b'--foo\r\n'
+            b'\r\n'
+            b'abc\r\n--foo--')
+    form = HeadersHandler(b'multipart/form-data; boundary=foo')
+    for idx in range(len(body)):
+        form.feed_data(body[idx:idx+1])
+    assert form.blocks == [
+        [(b'Content-Disposition', b'form-data; name=baz; filename="baz.png"'),
+         (b'Content-Type', b'image/png')],
+        [],
+    ]
+    assert form.parts[0].headers == dict(form.blocks[0])
+    assert form.on_headers_complete_called == 2
+
+
+class DigestHandler(SinkHandler):
+
+    on_data = None
+
+
+@pytest.mark.parametrize('chunk_size', [1, 5, 1000])
+def test_parse_digests(tmp_path, chunk_size):
+    import hashlib
+    import zlib
+    content = bytes(range(256)) * 3
+    body = (b'--foo\r\n'
+            b'Content-Disposition: form-data; name=baz; filename="baz.png"\r\n'
+            b'\r\n' + content + b'\r\n'
+            b'--foo\r\n'
+            b'Content-Disposition: form-data; name="text1"\r\n'
+            b'\r\n'
+            b'abc\r\n--foo--')
+    with (tmp_path / 'baz.png').open('wb') as f:
+        form = DigestHandler(b'multipart/form-data; boundary=foo', [f, None],
+                             digests=['sha256', 'crc32'], min_data_size=4)
+        for idx in range(0, len(body), chunk_size):
+            form.feed_data(body[idx:idx+chunk_size])
+    assert (tmp_path / 'baz.png').read_bytes() == content
+    first, second = form.summaries
+    assert first.size == len(content)
+    assert first.digests == {
+        'sha256': hashlib.sha256(content).hexdigest(),
+        'crc32': '%08x' % zlib.crc32(content)}
+    assert second.size == 3
+    assert second.digests == {'sha256': hashlib.sha256(b'abc').hexdigest(),
+                              'crc32': '%08x' % zlib.crc32(b'abc')}
+
+
+def test_parse_digests_with_on_data():
+    import hashlib
+    form = SinkHandler(b'multipart/form-data; boundary=foo', [None],
+                       digests=['md5'])
+    form.feed_data(b'--foo\r\n\r\nabc\r\n--foo--')
+    assert form.parts[0].content == b'abc'
+    assert form.summaries[0].digests == {
+        'md5': hashlib.md5(b'abc').hexdigest()}
+
+
+def test_parse_digests_unknown():
+    with pytest.raises(ValueError):
+        Parser(None, b'multipart/form-data; boundary=foo', digests=['nope'])
+
+
+def test_parse_digests_feed_events():
+    import hashlib
+    parser = Parser(None, b'multipart/form-data; boundary=foo',
+                    digests=['sha1'])
+    events = parser.feed(b'--foo\r\n\r\nabc\r\n--foo--')
+    kind, summary, _ = events[-2]
+    assert kind == Event.PART_COMPLETE
+    assert summary.size == 3
+    assert summary.digests == {'sha1': hashlib.sha1(b'abc').hexdigest()}
+
+
+@pytest.mark.parametrize('sink', [False, True, 'file.txt'])
+def test_parse_invalid_sink(sink):
+    form = SinkHandler(b'multipart/form-data; boundary=foo', [sink])
+    with pytest.raises(TypeError):
+        form.feed_data(b'--foo\r\n\r\nabc\r\n--foo--')
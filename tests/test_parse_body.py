@@ -0,0 +1,161 @@
+import os
+
+from multifruits import Parser, parse_body
+import pytest
+
+
+BODY = (b'--foo\r\n'
+        b'Content-Disposition: form-data; name=baz; filename="baz.png"\r\n'
+        b'Content-Type: image/png\r\n'
+        b'\r\n'
+        b'abc\r\n--fo\r\ndef\r\n'
+        b'--foo\r\n'
+        b'Content-Disposition: form-data; name="text1"\r\n'
+        b'\r\n'
+        b'abc\r\n--foo--')
+CONTENT_TYPE = b'multipart/form-data; boundary=foo'
+
+
+def test_parse_body():
+    parts = parse_body(BODY, CONTENT_TYPE)
+    assert len(parts) == 2
+    assert parts[0].headers == [
+        (b'Content-Disposition', b'form-data; name=baz; filename="baz.png"'),
+        (b'Content-Type', b'image/png'),
+    ]
+    assert isinstance(parts[0].data, memoryview)
+    assert parts[0].data == b'abc\r\n--fo\r\ndef'
+    assert BODY[parts[0].data_start:parts[0].data_end] == b'abc\r\n--fo\r\ndef'
+    assert BODY[parts[1].headers_start:parts[1].headers_end] == (
+        b'Content-Disposition: form-data; name="text1"')
+    assert parts[1].headers == [
+        (b'Content-Disposition', b'form-data; name="text1"')]
+    assert parts[1].data == b'abc'
+
+
+def test_parse_body_preamble_epilogue_and_empty_parts():
+    body = (b'preamble\r\n--foo\r\n'
+            b'\r\n'
+            b'\r\n--foo\r\n'
+            b'X-Empty:\r\n'
+            b'\r\n'
+            b'\r\n'
+            b'\r\n--foo--\r\nepilogue')
+    parts = parse_body(bytearray(body), CONTENT_TYPE)
+    assert [part.headers for part in parts] == [[], [(b'X-Empty', b'')]]
+    assert [bytes(part.data) for part in parts] == [b'', b'\r\n']
+
+
+def test_parse_body_empty():
+    with pytest.raises(ValueError):
+        parse_body(b'', CONTENT_TYPE)
+
+
+def test_parse_body_missing_boundary():
+    with pytest.raises(ValueError):
+        parse_body(BODY, b'multipart/form-data')
+
+
+@pytest.mark.parametrize('body', [
+    BODY[:-2],
+    BODY[:20],
+    BODY.replace(b'--foo\r\nContent-Disposition: form-data; name="text1"',
+                 b'--foox\r\nContent-Disposition: form-data; name="text1"'),
+    b'--bar\r\n\r\nabc\r\n--bar--',
+])
+def test_parse_body_invalid(body):
+    with pytest.raises(ValueError):
+        parse_body(body, CONTENT_TYPE)
+
+
+@pytest.mark.parametrize('body', [
+    b'--foo\r\nContent Type: text/plain\r\n\r\nabc\r\n--foo--',
+    b'--foo\r\nX: 1\r\n--foo\r\nY: 2\r\n\r\ndata\r\n--foo--',
+    b'--foo\r\nX: 1\r\r\n\r\nabc\r\n--foo--',
+    b'--foo\r\n: 1\r\n\r\nabc\r\n--foo--',
+])
+def test_parse_body_invalid_header(body):
+    # Rejected like Parser does, not when headers are accessed.
+    with pytest.raises(ValueError):
+        parse_body(body, CONTENT_TYPE)
+    parser = Parser(None, CONTENT_TYPE)
+    with pytest.raises(ValueError):
+        parser.feed(body)
+
+
+def test_parse_file(tmp_path):
+    from multifruits import parse_file
+    path = tmp_path / 'body'
+    path.write_bytes(BODY)
+    with parse_file(str(path), CONTENT_TYPE) as parts:
+        assert [bytes(part.data) for part in parts] == [
+            b'abc\r\n--fo\r\ndef', b'abc']
+        assert parts[1].headers == [
+            (b'Content-Disposition', b'form-data; name="text1"')]
+        # Kernel side copy to a file, then to a pipe.
+        with open(tmp_path / 'copy', 'wb') as dest:
+            dest.write(b'>')
+            assert parts[0].copy_to(dest) == 14
+            assert parts[1].copy_to(dest.fileno()) == 3
+        assert (tmp_path / 'copy').read_bytes() == b'>abc\r\n--fo\r\ndefabc'
+        read, write = os.pipe()
+        try:
+            assert parts[0].copy_to(write) == 14
+            assert os.read(read, 100) == b'abc\r\n--fo\r\ndef'
+        finally:
+            os.close(read)
+            os.close(write)
+    with pytest.raises(ValueError):
+        parts[0].data
+    parts.close()
+
+
+def test_parse_file_close(tmp_path):
+    from multifruits import parse_file
+    path = tmp_path / 'body'
+    path.write_bytes(BODY)
+    parts = parse_file(path, CONTENT_TYPE)
+    data = parts[1].data
+    file = parts._file
+    with pytest.raises(BufferError):
+        parts.close()  # Data still in use.
+    assert file.closed
+    data.release()
+    parts.close()
+    assert parts._mapped is None
+
+
+def test_parse_file_fd(tmp_path):
+    from multifruits import parse_file
+    path = tmp_path / 'body'
+    path.write_bytes(BODY)
+    with open(path, 'rb') as f:
+        with parse_file(f.fileno(), CONTENT_TYPE) as parts:
+            assert len(parts) == 2
+            with open(tmp_path / 'copy', 'wb') as dest:
+                parts[1].copy_to(dest)
+        assert not f.closed
+    assert (tmp_path / 'copy').read_bytes() == b'abc'
+
+
+def test_parse_file_empty(tmp_path):
+    from multifruits import parse_file
+    path = tmp_path / 'body'
+    path.write_bytes(b'')
+    with pytest.raises(ValueError):
+        parse_file(path, CONTENT_TYPE)
+
+
+def test_parse_file_truncated(tmp_path):
+    from multifruits import parse_file
+    path = tmp_path / 'body'
+    path.write_bytes(BODY[:-4])
+    with pytest.raises(ValueError):
+        parse_file(path, CONTENT_TYPE)
+
+
+def test_copy_to_in_memory(tmp_path):
+    parts = parse_body(BODY, CONTENT_TYPE)
+    with open(tmp_path / 'copy', 'wb') as dest:
+        assert parts[1].copy_to(dest) == 3
+    assert (tmp_path / 'copy').read_bytes() == b'abc'
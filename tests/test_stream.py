@@ -0,0 +1,91 @@
+import io
+
+from multifruits import Parser, UrlencodedParser, parse_stream
+import pytest
+
+BODY = (b'--foo\r\n'
+        b'Content-Disposition: form-data; name=baz; filename="baz.png"\r\n'
+        b'\r\n' + bytes(range(256)) * 10 + b'\r\n'
+        b'--foo\r\n'
+        b'Content-Disposition: form-data; name="text1"\r\n'
+        b'\r\n'
+        b'abc\r\n--foo--')
+CONTENT_TYPE = b'multipart/form-data; boundary=foo'
+
+
+class Handler:
+
+    def __init__(self):
+        self.parts = []
+
+    def on_part_begin(self):
+        self.parts.append(b'')
+
+    def on_data(self, data):
+        self.parts[-1] += data
+
+    def on_field(self, name, value):
+        self.parts.append((name, value))
+
+
+class Reader:
+    # Like wsgi.input of some servers: no readinto.
+
+    def __init__(self, data):
+        self._stream = io.BytesIO(data)
+        self.sizes = []
+
+    def read(self, size):
+        self.sizes.append(size)
+        return self._stream.read(size)
+
+
+@pytest.mark.parametrize('buffer_size', [1, 7, 4096])
+def test_parse_stream(buffer_size):
+    handler = Handler()
+    parser = parse_stream(io.BytesIO(BODY), handler, CONTENT_TYPE,
+                          buffer_size=buffer_size, zero_copy=True)
+    assert isinstance(parser, Parser)
+    assert handler.parts == [bytes(range(256)) * 10, b'abc']
+
+
+def test_parse_stream_content_length():
+    handler = Handler()
+    reader = Reader(BODY + b'next request')
+    parse_stream(reader, handler, CONTENT_TYPE, buffer_size=1000,
+                 content_length=str(len(BODY)))
+    assert handler.parts[1] == b'abc'
+    assert sum(reader.sizes) == len(BODY)
+    assert reader.sizes[-1] == len(BODY) % 1000
+
+
+def test_parse_stream_truncated():
+    with pytest.raises(ValueError):
+        parse_stream(io.BytesIO(BODY[:-10]), Handler(), CONTENT_TYPE)
+    with pytest.raises(ValueError):
+        parse_stream(io.BytesIO(BODY), Handler(), CONTENT_TYPE,
+                     content_length=len(BODY) + 1)
+
+
+def test_parse_stream_urlencoded():
+    handler = Handler()
+    parser = parse_stream(io.BytesIO(b'a=1&b=%C3%A9'), handler,
+                          b'application/x-www-form-urlencoded', buffer_size=3)
+    assert isinstance(parser, UrlencodedParser)
+    assert handler.parts == [(b'a', b'1'), (b'b', 'é'.encode())]
+
+
+def test_parse_stream_invalid_sizes():
+    with pytest.raises(ValueError):
+        parse_stream(io.BytesIO(BODY), Handler(), CONTENT_TYPE, buffer_size=0)
+    with pytest.raises(ValueError):
+        parse_stream(io.BytesIO(BODY), Handler(), CONTENT_TYPE,
+                     content_length=-1)
+
+
+def test_parse_stream_urlencoded_with_parser_options():
+    handler = Handler()
+    parse_stream(io.BytesIO(b'a=1&b=2'), handler,
+                 b'application/x-www-form-urlencoded', zero_copy=True,
+                 min_data_size=16, max_fields=2)
+    assert handler.parts == [(b'a', b'1'), (b'b', b'2')]
@@ -0,0 +1,135 @@
+from urllib.parse import parse_qsl, urlencode
+
+from multifruits import (FieldTooLarge, Parser, TooManyFields,
+                         UrlencodedParser, create_parser)
+import pytest
+
+
+class Handler:
+
+    def __init__(self, **kwargs):
+        self.parser = UrlencodedParser(self, **kwargs)
+        self.fields = []
+        self.events = []
+
+    def on_body_begin(self):
+        self.events.append('begin')
+
+    def on_field(self, name, value):
+        self.fields.append((name, value))
+
+    def on_body_complete(self):
+        self.events.append('complete')
+
+
+BODY = urlencode([('name', 'Zoé'), ('q', 'a+b=c&d %'), ('empty', ''),
+                  ('ünï', '100%')]).encode()
+FIELDS = [(name.encode(), value.encode())
+          for name, value in parse_qsl(BODY.decode(), keep_blank_values=True)]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, len(BODY)])
+def test_parse_urlencoded(chunk_size):
+    form = Handler()
+    for idx in range(0, len(BODY), chunk_size):
+        form.parser.feed_data(BODY[idx:idx+chunk_size])
+    form.parser.feed_eof()
+    assert form.fields == FIELDS
+    assert form.events == ['begin', 'complete']
+
+
+@pytest.mark.parametrize('body, expected', [
+    (b'a=1&&b=2&', [(b'a', b'1'), (b'b', b'2')]),
+    (b'flag&a=b=c', [(b'flag', b''), (b'a', b'b=c')]),
+    (b'=x', [(b'', b'x')]),
+    (b'a=%zz%4&b=%', [(b'a', b'%zz%4'), (b'b', b'%')]),
+    (b'a=%4a%4A+', [(b'a', b'JJ ')]),
+    (b'a=%0', [(b'a', b'%0')]),
+])
+def test_parse_urlencoded_edge_cases(body, expected):
+    form = Handler()
+    for idx in range(len(body)):
+        form.parser.feed_data(body[idx:idx+1])
+    form.parser.feed_eof()
+    assert form.fields == expected
+
+
+def test_parse_urlencoded_empty():
+    form = Handler()
+    form.parser.feed_data(b'')
+    form.parser.feed_eof()
+    assert form.fields == []
+    assert form.events == []
+
+
+def test_parse_urlencoded_limits():
+    form = Handler(max_fields=2)
+    form.parser.feed_data(b'a=1&b=2&c')
+    with pytest.raises(TooManyFields):
+        form.parser.feed_eof()
+    form = Handler(max_field_size=5)
+    form.parser.feed_data(b'a=123&bc=12')
+    with pytest.raises(FieldTooLarge):
+        form.parser.feed_data(b'3')
+
+
+def test_parse_urlencoded_reset():
+    form = Handler()
+    form.parser.feed_data(b'a=1&b=')
+    form.parser.reset()
+    form.parser.feed_data(b'c=3')
+    form.parser.feed_eof()
+    assert form.fields == [(b'a', b'1'), (b'c', b'3')]
+
+
+def test_create_parser():
+    form = Handler()
+    parser = create_parser(form, b'application/x-www-form-urlencoded')
+    assert isinstance(parser, UrlencodedParser)
+    parser.feed_data(b'a=1')
+    parser.feed_eof()
+    assert form.fields == [(b'a', b'1')]
+    parser = create_parser(form, b'Multipart/Form-Data; boundary=foo')
+    assert isinstance(parser, Parser)
+    parser.feed_data(b'--foo\r\n\r\nabc\r\n--fo')
+    with pytest.raises(ValueError):
+        parser.feed_eof()
+    parser.feed_data(b'o--')
+    parser.feed_eof()
+    with pytest.raises(ValueError):
+        create_parser(form, b'application/json')
+
+
+@pytest.mark.parametrize('content_type', [
+    b'application/x-www-form-urlencoded', b'multipart/form-data; boundary=a'])
+def test_create_parser_mixed_options(content_type):
+    form = Handler()
+    parser = create_parser(form, content_type, zero_copy=True, max_parts=10,
+                           min_data_size=16, max_fields=10, max_body_size=100)
+    with pytest.raises(TypeError):
+        create_parser(form, content_type, max_feilds=10)
+    if isinstance(parser, UrlencodedParser):
+        parser.feed_data(b'a=1')
+        parser.feed_eof()
+        assert form.fields == [(b'a', b'1')]
+
+
+def test_create_parser_empty_body():
+    form = Handler()
+    parser = create_parser(form, b'application/x-www-form-urlencoded')
+    parser.feed_eof()
+    assert form.fields == []
+    parser = create_parser(form, b'multipart/form-data; boundary=foo')
+    with pytest.raises(ValueError):
+        parser.feed_eof()
+
+
+def test_parse_urlencoded_field_too_large_single_chunk():
+    form = Handler(max_field_size=5)
+    with pytest.raises(FieldTooLarge):
+        form.parser.feed_data(b'a=1&b=' + b'%20' * 1000 + b'&c=3')
+    assert form.fields == [(b'a', b'1')]
+    form = Handler(max_field_size=5)
+    form.parser.feed_data(b'ab=%2')
+    with pytest.raises(FieldTooLarge):
+        form.parser.feed_data(b'0')
@@ -0,0 +1,95 @@
+import io
+
+from multifruits import (MultipartWriter, extract_filename, parse_body,
+                         parse_content_disposition, parse_form)
+import pytest
+
+
+def test_writer():
+    writer = MultipartWriter(b'foo')
+    writer.add_field('text', 'Zoé')
+    writer.add_field(b'json', b'{}', content_type=b'application/json')
+    writer.add_file('upload', io.BytesIO(b'abc\r\n--fo\r\ndef'), 'baz.png',
+                    b'image/png')
+    assert writer.content_type == b'multipart/form-data; boundary=foo'
+    body = b''.join(writer)
+    assert body == (
+        b'--foo\r\n'
+        b'Content-Disposition: form-data; name="text"\r\n'
+        b'\r\n' + 'Zoé'.encode() + b'\r\n'
+        b'--foo\r\n'
+        b'Content-Disposition: form-data; name="json"\r\n'
+        b'Content-Type: application/json\r\n'
+        b'\r\n'
+        b'{}\r\n'
+        b'--foo\r\n'
+        b'Content-Disposition: form-data; name="upload"; filename="baz.png"\r\n'
+        b'Content-Type: image/png\r\n'
+        b'\r\n'
+        b'abc\r\n--fo\r\ndef\r\n'
+        b'--foo--\r\n')
+    assert writer.content_length == len(body)
+
+
+def test_writer_round_trip():
+    writer = MultipartWriter()
+    content = bytes(range(256)) * 1000
+    writer.add_field('na"me', '')
+    writer.add_file('file', io.BytesIO(content), 'été "2".txt', size=1000)
+    writer.add_file('view', memoryview(content)[:10], 'a.bin')
+    length = writer.content_length
+    chunks = list(writer)
+    assert sum(len(chunk) for chunk in chunks) == length
+    fields, files = parse_form(b''.join(chunks), writer.content_type)
+    assert fields[0].name == b'na"me'
+    assert fields[0].value == b''
+    assert files[0].filename == 'été "2".txt'
+    assert files[0].file.read() == content[:1000]
+    assert files[1].filename == 'a.bin'
+    assert files[1].file.read() == content[:10]
+
+
+def test_writer_filename_star():
+    writer = MultipartWriter(b'foo')
+    writer.add_file('file', b'', 'naïve 100%.txt')
+    part, = parse_body(b''.join(writer), writer.content_type)
+    disposition = dict(part.headers)[b'Content-Disposition']
+    assert disposition == (b'form-data; name="file"; filename="na?ve 100%.txt";'
+                           b" filename*=utf-8''na%C3%AFve%20100%25.txt")
+    assert extract_filename(
+        parse_content_disposition(disposition)[1]) == 'naïve 100%.txt'
+
+
+def test_writer_chunks():
+    writer = MultipartWriter(b'foo', chunk_size=4)
+    writer.add_file('file', io.BytesIO(b'0123456789'))
+    assert list(writer)[1:-1] == [b'0123', b'4567', b'89']
+
+
+def test_writer_quoted_boundary():
+    writer = MultipartWriter(b'foo bar', b'mixed')
+    assert writer.content_type == b'multipart/mixed; boundary="foo bar"'
+    writer.add_part(b'abc', [(b'Content-Type', b'text/plain')])
+    part, = parse_body(b''.join(writer), writer.content_type)
+    assert part.data == b'abc'
+
+
+def test_writer_short_file():
+    writer = MultipartWriter(b'foo')
+    writer.add_file('file', io.BytesIO(b'abc'), size=4)
+    with pytest.raises(ValueError):
+        b''.join(writer)
+
+
+@pytest.mark.parametrize('boundary', [b'', b'a' * 71, b'a\r\nb'])
+def test_writer_invalid_boundary(boundary):
+    with pytest.raises(ValueError):
+        MultipartWriter(boundary)
+
+
+def test_writer_invalid_header():
+    writer = MultipartWriter(b'foo')
+    with pytest.raises(ValueError):
+        writer.add_part(b'', [(b'X-Foo', b'a\r\nb')])
+    with pytest.raises(ValueError):
+        writer.add_field('a\r\n', b'b')